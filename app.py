@@ -1,406 +1,477 @@
-import sys
-import subprocess
-# --- 0. Package Installation ---
-try:
-    import streamlit as st
-    import google.generativeai as genai
-    from dotenv import load_dotenv
-    from reportlab.lib.pagesizes import letter
-except ImportError:
-    import streamlit as st
-    st.info("First-time setup: Installing required packages... Please wait a moment.")
-    subprocess.check_call([sys.executable, "-m", "pip", "install",
-                          "streamlit", "google-generativeai", "python-dotenv", "reportlab"])
-    st.success("Packages installed successfully! The app is now restarting.")
-    st.rerun()
+import importlib.util
+import streamlit as st
 
 
-import streamlit as st
-import google.generativeai as genai
-import os, re, time, datetime, random, base64
+# --- 0. Startup Check ---
+st.set_page_config(
+    page_title="GlobalWell AI",
+    layout="centered",
+    initial_sidebar_state="expanded"
+)
+
+
+# google-generativeai is checked by the Gemini backend itself, so offline backends run without it.
+REQUIRED_PACKAGES = {"dotenv": "python-dotenv", "reportlab": "reportlab", "numpy": "numpy"}
+
+
+@st.cache_resource
+def find_missing_packages():
+    # Runs once per process; heavy packages are only located here, not imported.
+    missing = []
+    for module, package in REQUIRED_PACKAGES.items():
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ModuleNotFoundError:
+            found = False
+        if not found:
+            missing.append(package)
+    return missing
+
+
+missing_packages = find_missing_packages()
+if missing_packages:
+    st.error(f"Missing packages: {', '.join(missing_packages)}. Install them with `pip install -r requirements.txt` and restart the app.")
+    st.stop()
+if not hasattr(st, "fragment"):
+    st.error("GlobalWell AI needs Streamlit 1.37 or newer. Run `pip install -U -r requirements.txt` and restart the app.")
+    st.stop()
+
+
+import os, re, time, datetime, random, itertools, json
 from dotenv import load_dotenv
-from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.enums import TA_CENTER
-from streamlit.components.v1 import html
+from response_cache import ResponseCache, DEFAULT_CACHE_PATH
+from llm import LLMClient, LLMConfigError, SingleFlight, backend_from_env
+from llm_telemetry import telemetry_from_env
+from resilience import CircuitOpenError, DeadlineExceededError, resilience_from_env
+from hedging import hedger_from_env
+from chat_context import ChatContextBuilder, ChatMemory
+from chat_cache import ChatAnswerCache
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial, wraps
+from audio_server import AudioStore, AudioServer
+from noise_engine import NoiseEngine
+from plan_pdf import PdfCache, build_pdf_bytes
+from plan_doc import parse_plan
+from plan_buckets import BucketedPlanner
+from session_budget import BlobStore, SessionBudget, SessionMemoryRegistry, DEFAULT_BLOB_PATH
+from jobs import SessionJobs, generate_cancellable
+from journal_store import JournalStore, DEFAULT_JOURNAL_PATH
+from content_bank import ContentBank, DEFAULT_CONTENT_PATH
+from theme import APP_CSS
+from timer_component import chime_player, pomodoro_timer, start_command, stop_command
+from prompts import sanitize_input, get_wellness_plan_prompt
+from local_insights import InsightIndex, LocalInsights, DEFAULT_INSIGHTS_PATH, insight_prompt, current_month
+from instrumentation import instrumentation_from_env
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from uuid import uuid4
 
 
 # --- Helper functions (must be defined before use) ---
-def sanitize_input(text):
-    if not text:
-        return ""
-    return re.sub(r'[\\*_]', '', text).strip()
-
-
-def generate_plan_pdf(plan_text):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    styles = getSampleStyleSheet()
-    styles['h1'].alignment = TA_CENTER
-    story = [Paragraph("Your Personalized Wellness Plan", styles['h1']), Spacer(1, 24)]
-    plan_text = plan_text.replace('###', '').replace('**', '')
-    for line in plan_text.split('\n'):
-        if line.startswith('## '):
-            story.append(Paragraph(line.replace('## ', ''), styles['h2']))
-        else:
-            story.append(Paragraph(line, styles['Normal']))
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+@st.cache_resource
+def get_instrumentation():
+    return instrumentation_from_env()
+
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "unknown"
+
+
+def app_fragment(name, run_every=None):
+    """st.fragment timed as region `name`; when it reruns on its own, that is logged as a rerun of scope `name`."""
+    def decorate(fn):
+        @st.fragment(run_every=run_every)
+        @wraps(fn)
+        def run(*args, **kwargs):
+            partial_rerun = instrumentation.enabled and instrumentation.current is None
+            if partial_rerun:
+                instrumentation.begin_rerun(current_session_id(), scope=name)
+            try:
+                with instrumentation.region(name):
+                    return fn(*args, **kwargs)
+            finally:
+                if partial_rerun:
+                    instrumentation.end_rerun()
+        return run
+    return decorate
+
+
+@st.cache_resource
+def get_pdf_cache():
+    return PdfCache(ThreadPoolExecutor(max_workers=2, thread_name_prefix="globalwell-pdf"),
+                    builder=get_instrumentation().timed("pdf", build_pdf_bytes))
+
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(
+        path=os.getenv("GLOBALWELL_CACHE_PATH", DEFAULT_CACHE_PATH),
+        max_memory_items=int(os.getenv("GLOBALWELL_CACHE_MEMORY_ITEMS", "256")),
+        max_disk_items=int(os.getenv("GLOBALWELL_CACHE_DISK_ITEMS", "5000")),
+        ttl_seconds=float(os.getenv("GLOBALWELL_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    )
+
+
+@st.cache_resource
+def get_llm_telemetry():
+    instrumentation = get_instrumentation()
+    return telemetry_from_env(metrics=instrumentation.metrics if instrumentation.enabled else None)
+
+
+@st.cache_resource
+def get_llm_client():
+    return LLMClient(backend_from_env(), cache=get_response_cache(), singleflight=SingleFlight(),
+                     resilience=resilience_from_env(), telemetry=get_llm_telemetry(), hedging=hedger_from_env())
+
+
+@st.cache_resource
+def get_chat_cache():
+    return ChatAnswerCache(threshold=float(os.getenv("GLOBALWELL_CHAT_CACHE_THRESHOLD", "0.7")))
+
+
+@st.cache_resource
+def get_blob_store():
+    return BlobStore(os.getenv("GLOBALWELL_BLOB_PATH", DEFAULT_BLOB_PATH),
+                     max_memory_bytes=int(os.getenv("GLOBALWELL_BLOB_MEMORY_MB", "64")) * 1024 * 1024)
+
+
+@st.cache_resource
+def get_session_registry():
+    return SessionMemoryRegistry()
+
+
+def enforce_session_budget():
+    # Runs at the end of every full rerun, and after fragments that grow session state.
+    with instrumentation.region("session_budget"):
+        sizes = session_mem.enforce(summarized_upto=st.session_state.chat_memory.snapshot()[1])
+        get_session_registry().record(current_session_id(), sizes)
+        instrumentation.payload("session_state", sum(sizes.values()))
+
+
+def current_plan_doc():
+    # Parsed once per distinct plan for the whole process; the session only holds a reference.
+    return get_blob_store().parsed(st.session_state.wellness_plan, parse_plan)
+
+
+@st.cache_resource
+def get_content_bank():
+    return ContentBank(os.getenv("GLOBALWELL_CONTENT_PATH", DEFAULT_CONTENT_PATH))
+
+
+@st.cache_resource
+def get_journal_store():
+    return JournalStore(os.getenv("GLOBALWELL_JOURNAL_PATH", DEFAULT_JOURNAL_PATH))
+
+
+def get_journal_user_id():
+    # No accounts yet: the journal key lives in the URL so a refresh or bookmark keeps the history.
+    user_id = st.query_params.get("journal")
+    if not user_id:
+        user_id = uuid4().hex
+        st.query_params["journal"] = user_id
+    return user_id
+
 
+def reset_gratitude_pages():
+    st.session_state.gratitude_cursors = []
 
-def generate_ai_response(prompt):
+
+@st.cache_resource
+def get_background_executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="globalwell-bg")
+
+
+@st.cache_resource
+def get_local_insights():
+    return LocalInsights(InsightIndex(os.getenv("GLOBALWELL_INSIGHTS_PATH", DEFAULT_INSIGHTS_PATH)),
+                         partial(get_llm_client().generate, feature="local_info"), get_background_executor())
+
+
+def generate_ai_response(prompt, feature):
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        with instrumentation.region("llm"):
+            return llm_client.generate(prompt, feature=feature)
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        st.warning(str(e))
+        return None
     except Exception as e:
         st.error(f"An API error occurred: {e}")
         return None
 
 
-def get_wellness_plan_prompt(inputs):
-    return f"""
-You are GlobalWell AI, an empathetic AI Wellness Buddy. Provide a personalized, actionable wellness plan that aligns with **UN SDG 3**.
-
-
-**Core Instructions:**
-1. Accessibility & Affordability: Practical, low-cost, seasonal foods; minimal-equipment fitness.
-2. Holistic: Cover nutrition, physical activity, mental well-being, and sleep.
-3. Restriction: No specific supplements/medicines/drugs.
-4. Add a section: **Alignment with SDG 3**.
-
-
-**User Profile:**
-- Location: {inputs['region']}, {inputs['state']}, {inputs['country']} | Age: {inputs['age']}, Gender: {inputs['gender']}
-- Diet: {inputs['diet']}, Activity: {inputs['activity']} | Health Conditions: {inputs['health'] or 'None'}
-- Goal: {inputs['goal']} | Reason: {inputs['reason'] or 'Not specified'}
-"""
-
-
-def get_local_info_prompt(location):
-    return f"""
-As GlobalWell AI, for a user in **{location}**:
-1. **Hyper-Local Produce Guide:** List 3–4 seasonal, affordable, nutritious fruits/vegetables readily available now.
-2. **Wellness Myth Buster:** One relevant "Myth vs. Fact" debunking an expensive trend with a simple alternative.
-Format clearly with markdown.
-"""
-
-
-# --- Tighten spacing above title and global styles, remove space above main title ---
-st.markdown("""
-    <style>
-    .block-container {padding-top: 0rem !important;}
-    h1 {margin-top: 0 !important;}
-    /* Sidebar text color in dark mode */
-    section[data-testid="stSidebar"] * {
-      color: #EAECEE !important;
-    }
-    /* Button container fix */
-    .sidebar-button-row {
-        display: flex;
-        justify-content: space-between;
-        gap: 8px;
-        margin-bottom: 10px;
-    }
-    .sidebar-button-row > div {
-        flex: 1 1 0px;
-    }
-    /* Fix text color for cards and section boxes in dark mode */
-    .section-box, .card {
-        color: #EAECEE !important;
-        background: rgba(44, 81, 147, 0.5) !important;
-    }
-    /* Additional global dark mode styling */
-    .stTextInput>div>div>input, .stTextArea>div>textarea {
-        color: #EAECEE !important;
-        background-color: #17224D !important;
-    }
-    </style>
-""", unsafe_allow_html=True)
+class ResponseFailed(Exception):
+    """A streamed response broke off; the error is already shown and partial output must be dropped."""
 
 
-# --- 1. Load API ---
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    st.error("Gemini API key not found. Please create a .env file with GEMINI_API_KEY='YOUR_API_KEY'.")
-    st.stop()
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+def generate_ai_response_stream(prompt, feature):
+    try:
+        with instrumentation.region("llm"):
+            for chunk in llm_client.stream(prompt, feature=feature):
+                yield chunk
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        st.warning(str(e))
+        raise ResponseFailed(feature) from e
+    except Exception as e:
+        st.error(f"An API error occurred: {e}")
+        raise ResponseFailed(feature) from e
 
 
-# --- 2. App Config & Color Palette ---
-st.set_page_config(
-    page_title="GlobalWell AI",
-    layout="centered",
-    initial_sidebar_state="expanded"
-)
+@st.cache_resource
+def get_bucketed_planner():
+    return BucketedPlanner(partial(get_llm_client().generate, feature="wellness_plan"))
+
 
+def generate_plan_stream(inputs, prompt):
+    # GLOBALWELL_PLAN_MODE=bucketed shares one base plan per profile bucket and personalizes it cheaply.
+    if os.getenv("GLOBALWELL_PLAN_MODE", "full").lower() != "bucketed":
+        yield from generate_ai_response_stream(prompt, "wellness_plan")
+        return
+    try:
+        with instrumentation.region("llm"):
+            plan, info = get_bucketed_planner().plan(inputs)
+        instrumentation.count("bucketed_plans", mode=info["mode"])
+        yield plan
+    except (CircuitOpenError, DeadlineExceededError) as e:
+        st.warning(str(e))
+        raise ResponseFailed("wellness_plan") from e
+    except Exception as e:
+        st.error(f"An API error occurred: {e}")
+        raise ResponseFailed("wellness_plan") from e
 
-PALETTE_DARK = {
-    "BG": "#17224D",
-    "BG_GRADIENT": "linear-gradient(135deg, #17224D 0%, #233A75 100%)",
-    "TEXT": "#EAECEE",
-    "PRIMARY": "#F58125",
-    "PRIMARY_HOVER": "#F9A359",
-    "SECONDARY": "rgba(44, 81, 147, 0.5)",
-    "ACCENT": "#5184C4",
-    "ACCENT_HOVER": "#2C5193",
-    "DISCLAIMER_BG": "#2B3A67",
-    "DISCLAIMER_BORDER": "#F58125",
-    "TITLE_GRADIENT": "linear-gradient(45deg, #F58125, #FFFFFF)",
-    "CHAT_AI": "#2C5193",
-    "CHAT_USER": "#17224D",
-    "CARD_BG": "rgba(44, 81, 147, 0.4)",
-    "BORDER": "rgba(245, 129, 37, 0.4)",
-    "SECTION_BG": "rgba(44, 81, 147, 0.6)"
+
+def render_plan_stream(chunks):
+    # Each `## ` section gets its own section-box as soon as the next heading arrives;
+    # the section still being written is re-rendered in place as chunks land.
+    # A stream that breaks off returns None and clears what it had drawn.
+    chunks = iter(chunks)
+    boxes = []
+    try:
+        with st.spinner("Crafting your unique plan..."):
+            first = next(chunks, None)
+        if first is None:
+            return None
+        parts = []
+        current = ""
+        boxes.append(st.empty())
+        for chunk in itertools.chain([first], chunks):
+            parts.append(chunk)
+            current += chunk
+            *finished, current = re.split(r'\n(?=## )', current)
+            for section in finished:
+                boxes[-1].markdown(f'<div class="section-box">{section}</div>', unsafe_allow_html=True)
+                boxes.append(st.empty())
+            boxes[-1].markdown(f'<div class="section-box">{current}</div>', unsafe_allow_html=True)
+    except ResponseFailed:
+        for box in boxes:
+            box.empty()
+        return None
+    return "".join(parts)
+
+
+NOISE_OPTIONS = {
+    "White Noise": "white",
+    "Pink Noise": "pink",
+    "Rain": "rain",
+    "Brown Noise": "brown",
 }
 
 
-PALETTE = PALETTE_DARK  # Dark mode only
+def noise_slug(name):
+    return name.lower().replace(" ", "-")
+
+
+@st.cache_resource
+def get_noise_engine():
+    return NoiseEngine(
+        seconds=float(os.getenv("GLOBALWELL_NOISE_SECONDS", "15")),
+        sample_rate=int(os.getenv("GLOBALWELL_NOISE_SAMPLE_RATE", "16000")),
+        fmt=os.getenv("GLOBALWELL_NOISE_FORMAT", "wav"),
+    )
+
+
+def noise_stream(slug):
+    kind = next((kind for name, kind in NOISE_OPTIONS.items() if noise_slug(name) == slug), None)
+    if kind is None:
+        return None
+    return "audio/wav", get_noise_engine().iter_wav_stream(kind)
+
+
+def get_noise_track(name):
+    # Loops are synthesized on first use and then shared by every session.
+    store = get_audio_server().store
+    slug = noise_slug(name)
+    if slug not in store:
+        engine = get_noise_engine()
+        with instrumentation.region("noise_synth"):
+            store.add_bytes(slug, engine.render(NOISE_OPTIONS[name]), engine.mime)
+    return store.get(slug)
+
+
+def page_host():
+    # Host the browser loaded this page from; empty outside a browser (AppTest, benchmarks) on this machine.
+    try:
+        return st.context.headers.get("Host") or "localhost"
+    except Exception:
+        return "localhost"
+
+
+def get_noise_url(name):
+    """(url, mime) on the audio side server, or (None, mime) when this visitor's browser can't reach it."""
+    server = get_audio_server()
+    if not server.reachable_from(page_host()):
+        return None, get_noise_engine().mime
+    if os.getenv("GLOBALWELL_NOISE_STREAM", "").lower() in ("1", "true", "yes"):
+        return server.stream_url(noise_slug(name)), "audio/wav"
+    track = get_noise_track(name)
+    return server.url(track.slug), track.mime
+
+
+@st.cache_resource
+def get_audio_server():
+    # One copy of each track for the whole process; sessions only get URLs.
+    store = AudioStore()
+    routes = {}
+    if get_instrumentation().enabled:
+        routes["/metrics"] = lambda: ("text/plain; version=0.0.4",
+                                      get_instrumentation().metrics.render_prometheus().encode())
+        routes["/sessions"] = lambda: ("application/json",
+                                       json.dumps(get_session_registry().report()).encode())
+        routes["/llm"] = lambda: ("application/json", json.dumps(get_llm_telemetry().summary()).encode())
+    return AudioServer(
+        store,
+        host=os.getenv("GLOBALWELL_AUDIO_HOST", "127.0.0.1"),
+        port=int(os.getenv("GLOBALWELL_AUDIO_PORT", "8765")),
+        public_url=os.getenv("GLOBALWELL_AUDIO_PUBLIC_URL"),
+        routes=routes,
+        streams=noise_stream,
+    )
+
+
+@st.cache_resource
+def load_environment():
+    load_dotenv()
+    return True
+
+
+# --- 1. Load API ---
+load_environment()
+instrumentation = get_instrumentation()
+instrumentation.begin_rerun(current_session_id())
+if instrumentation.enabled:
+    get_audio_server()  # also serves /metrics
+try:
+    llm_client = get_llm_client()
+except LLMConfigError as e:
+    st.error(str(e))
+    st.stop()
+chat_context = ChatContextBuilder(budget_tokens=int(os.getenv("GLOBALWELL_CHAT_BUDGET_TOKENS", "6000")))
+
+
+# --- 2. Global CSS (formatted once in theme.py) ---
+st.markdown(APP_CSS, unsafe_allow_html=True)
+instrumentation.payload("css", len(APP_CSS))
 
 
 # --- 3. Session State Defaults ---
 defaults = {
     'wellness_plan': None,
     'chat_history': [],
+    'chat_memory': ChatMemory(),
     'local_info': None,
-    'gratitude': {},
+    'jobs': SessionJobs(get_background_executor()),
+    'gratitude_cursors': [],
     'last_hydration': time.time(),
-    'daily_tip': None,
     'noise_playing': False,
-    'noise_bytes': None,
+    'noise_url': None,
+    'noise_mime': "audio/wav",
+    'noise_track': None,
     'noise_choice': "White Noise",
     'chime_playing': False,
     'chime_duration_sec': 10,
+    'pomodoro_command': None,
+    'pomodoro_last_phase': None,
+    'focus_rounds': 0,
 }
 for k, v in defaults.items():
     if k not in st.session_state:
         st.session_state[k] = v
+st.session_state.pop('plan_doc', None)  # now shared through the blob store
+session_mem = SessionBudget(
+    st.session_state, get_blob_store(),
+    budget_bytes=int(os.getenv("GLOBALWELL_SESSION_BUDGET_KB", "512")) * 1024,
+    offload_bytes=int(os.getenv("GLOBALWELL_SESSION_OFFLOAD_KB", "8")) * 1024,
+    offloadable=("wellness_plan", "local_info"),
+    droppable=("local_info",),
+)
 
 
 # --- 4. Sidebar ---
-st.sidebar.header("GlobalWell AI")
-st.sidebar.markdown("Your personal wellness companion.")
-st.sidebar.markdown("---")
-
-
-def load_audio_file(filepath):
-    with open(filepath, 'rb') as f:
-        return f.read()
-
+# Noise and chime are fragments: their buttons rerun (and re-send) only their own panel.
+@app_fragment("noise")
+def noise_panel():
+    noise_choice = st.selectbox("Select Ambient Noise", list(NOISE_OPTIONS.keys()), index=list(NOISE_OPTIONS.keys()).index(st.session_state.noise_choice) if st.session_state.noise_choice in NOISE_OPTIONS else 0)
+    st.session_state.noise_choice = noise_choice
+
+    noise_col1, noise_col2 = st.columns(2)
+    with noise_col1:
+        start_noise = st.button("Start Noise", key="noise_start_btn")
+    with noise_col2:
+        stop_noise = st.button("Stop Noise", key="noise_stop_btn")
+
+    if start_noise:
+        try:
+            st.session_state.noise_url, st.session_state.noise_mime = get_noise_url(noise_choice)
+            st.session_state.noise_track = noise_choice
+            st.session_state.noise_playing = True
+        except Exception as e:
+            st.error(f"Could not generate {noise_choice}: {e}")
+            st.session_state.noise_playing = False
+
+    if stop_noise:
+        st.session_state.noise_playing = False
 
-NOISE_OPTIONS = {
-    "White Noise": "E:/GLobalWell/white-noise-358382.mp3",
-    "Rain": "E:/GLobalWell/calming-rain-257596.mp3",
-    "Brown Noise": "E:/GLobalWell/soft-brown-noise-299934.mp3"
-}
+    if st.session_state.noise_playing and st.session_state.noise_url:
+        audio_html = f"""
+        <audio controls autoplay loop preload="auto" style="width:100%">
+            <source src="{st.session_state.noise_url}" type="{st.session_state.noise_mime}" />
+            Your browser does not support the audio element.
+        </audio>
+        """
+        st.markdown(audio_html, unsafe_allow_html=True)
+        instrumentation.payload("noise_html", len(audio_html))
+    elif st.session_state.noise_playing and st.session_state.noise_track:
+        # Remote visitor and no GLOBALWELL_AUDIO_PUBLIC_URL: Streamlit serves the loop from the page's own origin.
+        track = get_noise_track(st.session_state.noise_track)
+        st.audio(track.data, format=track.mime, loop=True, autoplay=True)
+    else:
+        st.markdown("<i>No ambient noise playing.</i>", unsafe_allow_html=True)
 
 
-noise_choice = st.sidebar.selectbox("Select Ambient Noise", list(NOISE_OPTIONS.keys()), index=list(NOISE_OPTIONS.keys()).index(st.session_state.noise_choice) if st.session_state.noise_choice in NOISE_OPTIONS else 0)
-st.session_state.noise_choice = noise_choice
+@app_fragment("chime")
+def chime_panel():
+    # Chime Controls with loop until stopped
+    chime_cols = st.columns(2)
+    with chime_cols[0]:
+        start_chime = st.button("Start Chime", key="chime_start_btn")
+    with chime_cols[1]:
+        stop_chime = st.button("Stop Chime", key="chime_stop_btn")
 
-noise_col1, noise_col2 = st.sidebar.columns(2)
-with noise_col1:
-    start_noise = st.button("Start Noise", key="noise_start_btn")
-with noise_col2:
-    stop_noise = st.button("Stop Noise", key="noise_stop_btn")
+    if start_chime:
+        st.session_state.chime_playing = True
+    if stop_chime:
+        st.session_state.chime_playing = False
 
-def get_audio_base64(filepath):
-    with open(filepath, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+    # The player's iframe stays mounted; toggling only sends the new flag.
+    chime_player(st.session_state.chime_playing, st.session_state.chime_duration_sec)
 
-if start_noise:
-    try:
-        base64_audio = get_audio_base64(NOISE_OPTIONS[noise_choice])
-        st.session_state.noise_bytes = base64_audio
-        st.session_state.noise_playing = True
-    except Exception as e:
-        st.error(f"Failed to load audio file: {e}")
-        st.session_state.noise_playing = False
 
-if stop_noise:
-    st.session_state.noise_playing = False
-
-if st.session_state.noise_playing and st.session_state.noise_bytes:
-    audio_html = f"""
-    <audio controls autoplay loop style="width:100%">
-        <source src="data:audio/mp3;base64,{st.session_state.noise_bytes}" type="audio/mp3" />
-        Your browser does not support the audio element.
-    </audio>
-    """
-    st.sidebar.markdown(audio_html, unsafe_allow_html=True)
-else:
-    st.sidebar.markdown("<i>No ambient noise playing.</i>", unsafe_allow_html=True)
-
-
-# Chime Controls with loop until stopped
-chime_cols = st.sidebar.columns(2)
-with chime_cols[0]:
-    start_chime = st.button("Start Chime", key="chime_start_btn")
-with chime_cols[1]:
-    stop_chime = st.button("Stop Chime", key="chime_stop_btn")
-
-if start_chime:
-    st.session_state.chime_playing = True
-if stop_chime:
-    st.session_state.chime_playing = False
-
-if st.session_state.chime_playing:
-    duration = st.session_state.chime_duration_sec * 1000  # milliseconds
-    chime_js = f"""
-    <script>
-    (function(){{
-      const ctx = new (window.AudioContext || window.webkitAudioContext)();
-      const gainNode = ctx.createGain();
-      gainNode.gain.value = 0.13;
-      gainNode.connect(ctx.destination);
-
-      let oscillator;
-      function playTone() {{
-        oscillator = ctx.createOscillator();
-        oscillator.type = 'sine';
-        oscillator.frequency.setValueAtTime(660, ctx.currentTime);
-        oscillator.connect(gainNode);
-        oscillator.start();
-        gainNode.gain.setValueAtTime(0.13, ctx.currentTime);
-        gainNode.gain.linearRampToValueAtTime(0.05, ctx.currentTime + {duration/1000 * 0.75});
-        gainNode.gain.linearRampToValueAtTime(0.0, ctx.currentTime + {duration/1000});
-        oscillator.stop(ctx.currentTime + {duration/1000});
-        oscillator.onended = () => {{
-          if(window._gwChimePlaying) {{
-            playTone();
-          }}
-        }};
-      }}
-      window._gwChimePlaying = true;
-      playTone();
-      window.stopChime = () => {{
-        window._gwChimePlaying = false;
-        if (oscillator) {{
-          oscillator.stop();
-          oscillator.disconnect();
-        }}
-        gainNode.disconnect();
-      }};
-    }})();
-    </script>
-    """
-    st.components.v1.html(chime_js, height=40)
-else:
-    st.components.v1.html("""
-    <script>
-    if(window.stopChime) {{
-      window.stopChime();
-    }}
-    </script>""", height=0)
-
-
-# --- 5. Global CSS ---
-st.markdown(f"""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;700;800&display=swap');
-:root {{
-  --text: {PALETTE["TEXT"]};
-  --primary: {PALETTE["PRIMARY"]};
-  --primaryH: {PALETTE["PRIMARY_HOVER"]};
-  --accent: {PALETTE["ACCENT"]};
-  --border: {PALETTE["BORDER"]};
-  --card: {PALETTE["CARD_BG"]};
-}}
-.stApp {{
-  background: {PALETTE["BG_GRADIENT"]};
-  color: var(--text);
-  font-family: 'Inter', sans-serif;
-  transition: background-color 0.5s ease, color 0.5s ease;
-}}
-h1 {{
-  font-size: 3.0rem;
-  font-weight: 800;
-  text-align: center;
-  padding: 1rem 0 1.0rem 0;
-  background: {PALETTE["TITLE_GRADIENT"]};
-  -webkit-background-clip: text; -webkit-text-fill-color: transparent;
-  margin-top: 0 !important;
-  transition: color 0.5s ease;
-}}
-h3 {{ color: var(--text); font-weight: 700; margin-top: 1.2rem; }}
-
-.card, .section-box {{
-  background: var(--card);
-  backdrop-filter: blur(10px); -webkit-backdrop-filter: blur(10px);
-  border-radius: 18px;
-  padding: 1.3rem;
-  border: 1px solid var(--border);
-  box-shadow: 0 10px 30px 0 rgba(0,0,0,0.08);
-  transition: background-color 0.5s ease, color 0.5s ease, box-shadow .15s ease;
-}}
-.card:hover, .section-box:hover {{
-  transform: translateY(-2px);
-  box-shadow: 0 14px 35px rgba(0,0,0,0.12);
-}}
-section[data-testid="stSidebar"] {{
-  background: {PALETTE["SECONDARY"]};
-  backdrop-filter: blur(14px); -webkit-backdrop-filter: blur(14px);
-  border-right: 1px solid rgba(255,255,255,0.15);
-  transition: background-color 0.5s ease, color 0.5s ease;
-}}
-section[data-testid="stSidebar"] * {{ color: {PALETTE["TEXT"]} !important; }}
-
-div[data-testid="stButton"] > button {{
-  background: linear-gradient(45deg, var(--primary), var(--primaryH));
-  color: white; border-radius: 12px; padding: 12px 22px; font-weight: 700; border: none;
-  transition: transform .2s ease, box-shadow .2s ease;
-  box-shadow: 0 6px 20px rgba(0,0,0,0.2);
-}}
-div[data-testid="stButton"] > button:hover {{
-  transform: scale(1.03) translateY(-1px); box-shadow: 0 10px 28px rgba(0,0,0,0.25);
-}}
-
-div[data-testid="stTextInput"] input, div[data-testid="stTextArea"] textarea {{
-  border: 1px solid var(--border);
-  transition: all .2s ease-in-out !important;
-  color: var(--text) !important;
-  background-color: #17224D !important;
-}}
-div[data-testid="stTextInput"] input:focus, div[data-testid="stTextArea"] textarea:focus {{
-  border: 1px solid var(--primary);
-  box-shadow: 0 0 0 2px var(--border);
-}}
-
-div[data-testid="stTabs"] button[data-baseweb="tab"] {{
-  background-color: transparent; border-bottom: 2px solid transparent; color: var(--text);
-  transition: all .2s ease-in-out; padding: .8rem 1.2rem; border-radius: 10px 10px 0 0;
-}}
-div[data-testid="stTabs"] button[data-baseweb="tab"]:hover {{
-  background-color: {PALETTE["CARD_BG"]}; border-bottom: 2px solid {PALETTE["ACCENT"]};
-}}
-div[data-testid="stTabs"] button[aria-selected="true"] {{
-  border-bottom: 2px solid var(--primary); background-color: {PALETTE["CARD_BG"]};
-}}
-.disclaimer-box {{
-  background-color: {PALETTE["DISCLAIMER_BG"]};
-  border-left: 5px solid {PALETTE["DISCLAIMER_BORDER"]};
-  padding: 1rem 1.4rem; border-radius: 10px; margin-bottom: 1.3rem; color: var(--text); font-size: 14px;
-}}
-.breathing-circle {{
-  width: 160px; height: 160px; border-radius: 50%;
-  background: linear-gradient(135deg, {PALETTE["PRIMARY"]}, {PALETTE["ACCENT"]});
-  margin: 1.2rem auto; display: flex; align-items: center; justify-content: center;
-  animation-name: breathe; animation-timing-function: ease-in-out; animation-iteration-count: infinite;
-  box-shadow: 0 0 30px {PALETTE["PRIMARY"]};
-}}
-.breathing-circle.work {{ animation-duration: 5s; }}
-.breathing-circle.break {{ animation-duration: 8s; }}
-@keyframes breathe {{
-  0%, 100% {{ transform: scale(0.94); box-shadow: 0 0 18px var(--border); }}
-  50% {{ transform: scale(1.06); box-shadow: 0 0 42px var(--primary); }}
-}}
-.breathing-text {{ color: white; font-weight: 800; font-size: 1.1rem; letter-spacing: .6px; }}
-
-</style>
-""", unsafe_allow_html=True)
+with st.sidebar, instrumentation.region("sidebar"):
+    st.header("GlobalWell AI")
+    st.markdown("Your personal wellness companion.")
+    st.markdown("---")
+    noise_panel()
+    chime_panel()
 
 
 # --- Main App Content ---
@@ -410,24 +481,6 @@ st.title("GlobalWell AI")
 st.markdown("Your AI guide to a healthier lifestyle, aligned with **UN SDG 3: Good Health and Well-being**.")
 
 
-DAILY_TIPS = [
-    "A 5-minute walk after meals helps stabilize energy.",
-    "Stack habits: tie water sips to app switches or calls.",
-    "Slow your exhale: 4-in / 6-out reduces stress fast.",
-    "Keep fruit visible; you’ll eat it more.",
-    "Protect sleep: same wake-up time every day."
-]
-if not st.session_state.daily_tip:
-    st.session_state.daily_tip = DAILY_TIPS[int(time.time()) % len(DAILY_TIPS)]
-
-
-st.markdown(f"""
-<div class="card" style="display:flex;align-items:center;gap:.8rem;">
-  <div style="font-size:1.2rem;">💡 <b>Daily Tip:</b> {st.session_state.daily_tip}</div>
-</div>
-""", unsafe_allow_html=True)
-
-
 user_inputs = {
     'country': st.sidebar.text_input("Country", "India"),
     'state': st.sidebar.text_input("State/Province", "Gujarat"),
@@ -440,6 +493,16 @@ user_inputs = {
 }
 
 
+# Tips, facts and quiz questions rotate per user and day, localized by country, straight from the content bank.
+daily_tip = get_content_bank().daily("tip", get_journal_user_id(), user_inputs['country'])
+if daily_tip:
+    st.markdown(f"""
+<div class="card" style="display:flex;align-items:center;gap:.8rem;">
+  <div style="font-size:1.2rem;">💡 <b>Daily Tip:</b> {daily_tip['text']}</div>
+</div>
+""", unsafe_allow_html=True)
+
+
 st.header("Your Wellness Goal")
 user_inputs['goal'] = sanitize_input(st.text_area("What is your main wellness goal?", height=100))
 user_inputs['reason'] = sanitize_input(st.text_area("Any specific context or reason for this goal? (Optional)", height=70))
@@ -448,42 +511,44 @@ user_inputs['reason'] = sanitize_input(st.text_area("Any specific context or rea
 gen_clicked = st.button("Generate My Wellness Plan", use_container_width=True)
 
 
+plan_prompt = None
 if gen_clicked:
     if not user_inputs['goal']:
         st.warning("Please specify your wellness goal.")
     else:
-        with st.spinner("Crafting your unique plan..."):
-            prompt = get_wellness_plan_prompt(user_inputs)
-            plan = generate_ai_response(prompt)
-            if plan:
-                st.session_state.wellness_plan = plan
-                st.session_state.chat_history = []
-                st.session_state.local_info = None
-                st.balloons()
-
-
-tab1, tab2, tab3 = st.tabs(["Your Wellness Plan", "Local Wellness & Tools", "Chat About Your Plan"])
-
-
-with tab1:
-    if st.session_state.wellness_plan:
-        st.markdown(f"""<div class="disclaimer-box"><strong>Disclaimer:</strong> This is not medical advice. Always consult a healthcare professional.</div>""", unsafe_allow_html=True)
-        sections = re.split(r'\n(?=## )', st.session_state.wellness_plan)
-        for section in sections:
-            st.markdown(f'<div class="section-box">{section}</div>', unsafe_allow_html=True)
-        pdf_buffer = generate_plan_pdf(st.session_state.wellness_plan)
-        st.download_button("Download Plan as PDF", data=pdf_buffer, file_name="GlobalWell_AI_Plan.pdf", mime="application/pdf")
+        plan_prompt = get_wellness_plan_prompt(user_inputs)
+        # Fan out: local insights come from the precomputed index, or are fetched in the background while the plan streams.
+        location = f"{user_inputs['region']}, {user_inputs['country']}"
+        local_info, _ = get_local_insights().lookup(user_inputs['region'], user_inputs['country'])
+        if local_info is None:
+            st.session_state.jobs.submit("local_info", generate_cancellable, llm_client,
+                                         insight_prompt(user_inputs['region'], user_inputs['country'], current_month()),
+                                         "local_info", key=location)
+
+
+# Tab panels. Each is a fragment: its widgets rerun and re-send only that panel, and
+# everything it needs from the rest of the page is in session state or its arguments.
+@app_fragment("pdf")
+def pdf_panel():
+    # Built once per plan on a worker thread; reruns just pick up the cached bytes.
+    pdf_future = get_pdf_cache().submit(current_plan_doc())
+    if not pdf_future.done() and st.button("Prepare PDF"):
+        with st.spinner("Preparing your PDF..."):
+            wait([pdf_future])
+    if pdf_future.done():
+        if pdf_future.exception():
+            st.error(f"Could not build the PDF: {pdf_future.exception()}")
+        else:
+            st.download_button("Download Plan as PDF", data=pdf_future.result(), file_name="GlobalWell_AI_Plan.pdf", mime="application/pdf")
+            instrumentation.payload("pdf", len(pdf_future.result()))
     else:
-        st.info("Tell me your goal above, then click **Generate My Wellness Plan** to get started.")
+        st.caption("Your PDF is being prepared in the background.")
 
 
-with tab2:
-    if time.time() - st.session_state.last_hydration > 2 * 60 * 60:
-        st.toast("💧 Hydration reminder: take a few sips of water.", icon="💧")
-        st.session_state.last_hydration = time.time()
+@app_fragment("pomodoro")
+def pomodoro_panel():
     st.subheader("Breathing Tool + Pomodoro (Synced)")
     st.markdown("**How to use:** Start a Pomodoro session. The **breathing orb** matches the phase — calmer pace in Work, slower deep breaths in Breaks.")
-    st.markdown('<div id="breathing-orb" class="breathing-circle work"><div class="breathing-text">Breathe</div></div>', unsafe_allow_html=True)
 
     p1, p2, p3, p4 = st.columns([1,1,1,2])
     with p1:
@@ -494,150 +559,260 @@ with tab2:
         rounds = st.number_input("Rounds", min_value=1, max_value=12, value=4, step=1)
     with p4:
         start_timer = st.button("Start Pomodoro")
+        stop_timer = st.button("Stop Pomodoro")
 
     if start_timer:
-        now = int(time.time() * 1000)
-        html(f"""
-            <div id="gw_timer" style="font-weight:800;font-size:22px;margin:8px 0 12px 0;">Starting...</div>
-            <script>
-            (function(){{{{
-                const workMs = {work_min} * 60 * 1000;
-                const breakMs = {break_min} * 60 * 1000;
-                let rounds = {rounds};
-                let phase = 'work';
-                let end = Date.now() + workMs;
-                const orb = document.querySelector('#breathing-orb');
-                const timerEl = document.querySelector('#gw_timer');
-                function setPhase(p){{{{
-                    phase = p;
-                    if(orb) {{
-                        orb.classList.remove('work','break');
-                        orb.classList.add(p);
-                    }}
-                }}}}
-                function confetti(){{{{
-                    const el = document.createElement('div');
-                    el.style.cssText='position:fixed;inset:0;pointer-events:none;z-index:9999;overflow:hidden;';
-                    for(let i=0;i<60;i++) {{
-                        const s=document.createElement('div');
-                        s.textContent='🎉';
-                        s.style.position='absolute';
-                        s.style.left=(Math.random()*100)+'%';
-                        s.style.top='-10%';
-                        s.style.fontSize=(12+Math.random()*18)+'px';
-                        s.style.animation=`fall 1200ms ease-in forwards`;
-                        s.style.animationDelay=(Math.random()*600)+'ms';
-                        el.appendChild(s);
-                    }}
-                    document.body.appendChild(el);
-                    setTimeout(()=>el.remove(),1600);
-                }}}}
-                const style = document.createElement('style');
-                style.textContent='@keyframes fall{{to{{transform:translateY(120vh) rotate(720deg);opacity:.8}}}}';
-                document.head.appendChild(style);
-                function tick(){{{{
-                    const now = Date.now();
-                    let diff = Math.max(0, Math.floor((end - now)/1000));
-                    const m = String(Math.floor(diff/60)).padStart(2,'0'),
-                        s = String(diff%60).padStart(2,'0');
-                    if(timerEl) timerEl.innerText = (phase==='work'?'🧑‍💻 Work ':'☕ Break ')+ m + ':' + s;
-                    if(diff<=0) {{
-                        if(phase==='work') {{
-                            confetti();
-                            setPhase('break');
-                            end = Date.now() + breakMs;
-                        }} else {{
-                            rounds -= 1;
-                            if(rounds <= 0) {{
-                                if(timerEl) timerEl.innerText = '✅ Pomodoro Complete — great job!';
-                                clearInterval(window._gwPomodoro);
-                                return;
-                            }}
-                            setPhase('work');
-                            end = Date.now() + workMs;
-                        }}
-                    }}
-                }}}}
-                setPhase('work');
-                if(window._gwPomodoro) clearInterval(window._gwPomodoro);
-                window._gwPomodoro = setInterval(tick, 250);
-            }}}})();
-            </script>
-        """, height=40)
-    st.markdown("---")
-    with st.expander("How this helps"):
-        st.markdown("""
-- Pomodoro: Work in focused bursts (e.g., 25 min), then take a short break (e.g., 5 min). This reduces fatigue and improves consistency.
-- Breathing Orb: In Work, keep calm attention (medium pace). In Break, breathe slower and deeper to reset stress.
-- Tip: During breaks, look away from screens for 30 seconds and do 5 slow breaths following the orb.
-        """)
-
+        st.session_state.pomodoro_command = start_command(work_min, break_min, rounds)
+    if stop_timer:
+        st.session_state.pomodoro_command = stop_command()
+    # The timer runs in the browser; this rerun only happens when it reports a phase change.
+    status = pomodoro_timer(st.session_state.pomodoro_command)
+    if status:
+        phase = (status["command"], status["phase"], status["round"])
+        if phase != st.session_state.pomodoro_last_phase:
+            st.session_state.pomodoro_last_phase = phase
+            if status["phase"] in ("break", "done"):
+                st.session_state.focus_rounds += 1
+    if st.session_state.focus_rounds:
+        st.caption(f"Focus rounds completed this session: {st.session_state.focus_rounds}")
+
+
+@app_fragment("gratitude")
+def gratitude_panel():
     st.subheader("Mini Gratitude Journal")
     today_key = str(datetime.date.today())
     g1 = st.text_input("1) Something I'm grateful for", key=f"g1_{today_key}")
     g2 = st.text_input("2) Another thing I'm grateful for", key=f"g2_{today_key}")
     g3 = st.text_input("3) One small win today", key=f"g3_{today_key}")
     save_g = st.button("Save Today's Gratitude")
+    journal = get_journal_store()
+    journal_user = get_journal_user_id()
     if save_g:
-        st.session_state.gratitude[today_key] = [g1, g2, g3]
-        st.success("Saved! Come back tomorrow for more.")
-    if st.session_state.gratitude:
+        try:
+            saved = journal.save(journal_user, today_key, [g1, g2, g3]).wait(timeout=3)
+        except Exception as e:
+            st.error(f"Couldn't save your entries ({e}). Please try again.")
+        else:
+            if saved:
+                st.success("Saved! Come back tomorrow for more.")
+            else:
+                st.info("Saving... your entries will appear in the history shortly.")
+    # Keyset pagination: only one page of entries is ever read or rendered per rerun.
+    page_size = 7
+    window = st.session_state.get("gratitude_window", "Last 30 days")
+    since = datetime.date.today() - datetime.timedelta(days=30) if window == "Last 30 days" else None
+    cursors = st.session_state.gratitude_cursors
+    entries = journal.page(journal_user, before=cursors[-1] if cursors else None, since=since,
+                           limit=page_size + 1)
+    older_cursor = entries[page_size - 1][0] if len(entries) > page_size else None
+    if entries or cursors or journal.page(journal_user, limit=1):
         with st.expander("View Gratitude History"):
-            for d, items in sorted(st.session_state.gratitude.items(), reverse=True):
+            st.radio("Show", ["Last 30 days", "All entries"], horizontal=True, key="gratitude_window",
+                     on_change=reset_gratitude_pages)
+            for d, items in entries[:page_size]:
                 st.markdown(f"**{d}**")
                 for i, it in enumerate(items, 1):
                     if it and it.strip():
                         st.write(f"- {i}. {it}")
+            nav_newer, nav_older = st.columns(2)
+            with nav_newer:
+                st.button("Newer entries", key="gratitude_newer", disabled=not cursors,
+                          on_click=cursors.pop)
+            with nav_older:
+                st.button("Older entries", key="gratitude_older", disabled=older_cursor is None,
+                          on_click=cursors.append, args=(older_cursor,))
 
-    st.markdown("---")
-    st.subheader("Mindfulness Fact of the Day")
-    facts = [
-        "Long exhale stimulates the parasympathetic (calming) response.",
-        "Light morning sunlight helps anchor your body clock.",
-        "Journaling for 5 minutes can reduce rumination.",
-        "Walking meetings boost creativity in many small studies.",
-        "A tidy desk can reduce cognitive load and decision fatigue."
-    ]
-    idx = int(time.time() // 86400) % len(facts)
-    st.info(f"🧠 {facts[idx]}")
 
-    st.markdown("---")
+LOCAL_INFO_POLL_SECONDS = 1.0
+
+
+def health_hub(user_inputs, polling=False):
     st.subheader("Health Literacy Hub")
+    location = f"{user_inputs['region']}, {user_inputs['country']}"
+    insights = get_local_insights()
+    jobs = st.session_state.jobs
+    local_job = jobs.get("local_info")
+    if local_job is not None and local_job.key != location:
+        jobs.cancel("local_info")  # the user changed location; that answer is no longer needed
     if st.button("Get Local Wellness Info"):
-        with st.spinner("Finding local insights..."):
-            location = f"{user_inputs['region']}, {user_inputs['country']}"
-            prompt = get_local_info_prompt(location)
-            st.session_state.local_info = generate_ai_response(prompt)
+        local_info, _ = insights.lookup(user_inputs['region'], user_inputs['country'])
+        if local_info is not None:
+            session_mem.set_text('local_info', local_info)
+        else:
+            with st.spinner("Finding local insights..."):
+                if jobs.running("local_info", key=location):
+                    jobs.wait("local_info")
+                else:
+                    month = current_month()
+                    local_info = generate_ai_response(insight_prompt(user_inputs['region'], user_inputs['country'], month),
+                                                      "local_info")
+                    if local_info:
+                        insights.index.put(user_inputs['region'], user_inputs['country'], month, local_info)
+                    session_mem.set_text('local_info', local_info)
+    local_job = jobs.collect("local_info")
+    if local_job is not None:
+        if local_job.error:
+            st.error(f"An API error occurred: {local_job.error}")
+        else:
+            session_mem.set_text('local_info', local_job.result())
+            insights.index.put(user_inputs['region'], user_inputs['country'], current_month(), local_job.result())
+    elif jobs.running("local_info"):
+        st.caption("Fetching local insights in the background...")
+    elif polling:
+        st.rerun()  # the job is gone (collected or cancelled): one full rerun swaps back to the idle panel
     if st.session_state.local_info:
-        st.markdown(st.session_state.local_info)
+        st.markdown(session_mem.text('local_info'))
 
-    st.markdown("---")
+
+@app_fragment("health_hub")
+def health_hub_panel(user_inputs):
+    health_hub(user_inputs)
+
+
+@app_fragment("health_hub", run_every=LOCAL_INFO_POLL_SECONDS)
+def health_hub_polling_panel(user_inputs):
+    # Used while a local-info job runs, so its answer shows up without a click.
+    health_hub(user_inputs, polling=True)
+
+
+@app_fragment("quiz")
+def quiz_panel(country):
     st.subheader("Wellness Quick Quiz")
-    quiz_q = "Which habit most reliably improves sleep quality over time?"
-    quiz_opts = ["Taking long daytime naps", "Keeping a consistent wake-up time", "Drinking more coffee in the afternoon", "Heavy late-night workouts"]
-    ans = st.radio(quiz_q, quiz_opts, index=None)
+    quiz = get_content_bank().daily("quiz", get_journal_user_id(), country)
+    if quiz is None:
+        st.caption("No quiz today.")
+        return
+    if st.session_state.get("quiz_id") != quiz["id"]:
+        st.session_state.quiz_id = quiz["id"]  # a new question clears the previous answer
+        st.session_state.pop("quiz_answer", None)
+    ans = st.radio(quiz["question"], quiz["options"], index=None, key="quiz_answer")
     if st.button("Check Answer"):
         if ans is None:
             st.warning("Pick an option first 😊")
-        elif ans == "Keeping a consistent wake-up time":
-            st.success("Correct! Consistent wake-up anchors the circadian rhythm.")
+        elif ans == quiz["answer"]:
+            st.success(f"Correct! {quiz['explanation']}")
             st.balloons()
         else:
             st.error("Not quite. Try again!")
 
-with tab3:
+
+@app_fragment("chat")
+def chat_panel():
     if st.session_state.wellness_plan:
         for msg in st.session_state.chat_history:
             bubble_class = "user-bubble" if msg["role"] == "user" else "ai-bubble"
-            st.markdown(f'<div class="card {bubble_class}">{msg["content"]}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="card {bubble_class}">{session_mem.resolve(msg["content"])}</div>', unsafe_allow_html=True)
         question = st.text_area("Have a question about your plan?", key="chat_input")
         if st.button("Ask Question"):
             if question:
+                plan_doc = current_plan_doc()
+                plan_key = plan_doc.hash
+                # The cache is shared by every session on this plan, so it only holds answers built from
+                # the plan alone, and only a first question may use one; follow-ups depend on this conversation.
+                first_turn = not st.session_state.chat_history
+                cached = None
+                if first_turn:
+                    cached = get_chat_cache().lookup(plan_key, question)
+                    instrumentation.count("chat_cache", outcome="hit" if cached else "miss")
+                if not cached:
+                    # Only the sections the question is about; the whole plan when nothing stands out.
+                    prompt = chat_context.build(plan_doc.relevant_text(question), st.session_state.chat_history,
+                                                question, st.session_state.chat_memory)
                 st.session_state.chat_history.append({"role": "user", "content": question})
-                with st.spinner("Thinking..."):
-                    prompt = f"Based on this plan:\n{st.session_state.wellness_plan}\n\nUser question: {question}\nAnswer:"
-                    answer = generate_ai_response(prompt)
-                    st.session_state.chat_history.append({"role": "ai", "content": answer})
-                st.experimental_rerun()
+                st.markdown(f'<div class="card user-bubble">{question}</div>', unsafe_allow_html=True)
+                answer_box = st.empty()
+                if cached:
+                    answer = cached[0]
+                    answer_box.markdown(f'<div class="card ai-bubble">{answer}</div>', unsafe_allow_html=True)
+                else:
+                    answer = ""
+                    try:
+                        with st.spinner("Thinking..."):
+                            for chunk in generate_ai_response_stream(prompt, "chat"):
+                                answer += chunk
+                                answer_box.markdown(f'<div class="card ai-bubble">{answer}</div>', unsafe_allow_html=True)
+                    except ResponseFailed:
+                        # Keep the error on screen and the question in the box; nothing enters the history.
+                        answer_box.empty()
+                        st.session_state.chat_history.pop()
+                        return
+                    if first_turn and answer:
+                        get_chat_cache().put(plan_key, question, answer)
+                st.session_state.chat_history.append({"role": "ai", "content": answer or None})
+                st.session_state.chat_memory.schedule_summary(
+                    st.session_state.chat_history, chat_context.recent_messages,
+                    partial(llm_client.generate, feature="chat_summary"), get_background_executor())
+                enforce_session_budget()
+                try:
+                    st.rerun(scope="fragment")
+                except StreamlitAPIException:  # asked during a full-app run (e.g. AppTest): rerun the app
+                    st.rerun()
     else:
         st.info("Chat will be available after generating a wellness plan.")
+
+
+tab1, tab2, tab3 = st.tabs(["Your Wellness Plan", "Local Wellness & Tools", "Chat About Your Plan"])
+
+
+with tab1, instrumentation.region("plan_tab"):
+    if plan_prompt or st.session_state.wellness_plan:
+        st.markdown(f"""<div class="disclaimer-box"><strong>Disclaimer:</strong> This is not medical advice. Always consult a healthcare professional.</div>""", unsafe_allow_html=True)
+    plan_streamed = False
+    if plan_prompt:
+        plan = render_plan_stream(generate_plan_stream(user_inputs, plan_prompt))
+        if plan:
+            session_mem.set_text('wellness_plan', plan)
+            st.session_state.chat_history = []
+            st.session_state.chat_memory = ChatMemory()
+            session_mem.set_text('local_info', local_info)
+            plan_streamed = True
+            get_pdf_cache().submit(current_plan_doc())
+            st.balloons()
+    if st.session_state.wellness_plan:
+        if not plan_streamed:
+            for section in current_plan_doc().sections:
+                st.markdown(f'<div class="section-box">{section.markdown}</div>', unsafe_allow_html=True)
+        pdf_panel()
+    else:
+        st.info("Tell me your goal above, then click **Generate My Wellness Plan** to get started.")
+
+
+with tab2, instrumentation.region("tools_tab"):
+    if time.time() - st.session_state.last_hydration > 2 * 60 * 60:
+        st.toast("💧 Hydration reminder: take a few sips of water.", icon="💧")
+        st.session_state.last_hydration = time.time()
+    pomodoro_panel()
+    st.markdown("---")
+    with st.expander("How this helps"):
+        st.markdown("""
+- Pomodoro: Work in focused bursts (e.g., 25 min), then take a short break (e.g., 5 min). This reduces fatigue and improves consistency.
+- Breathing Orb: In Work, keep calm attention (medium pace). In Break, breathe slower and deeper to reset stress.
+- Tip: During breaks, look away from screens for 30 seconds and do 5 slow breaths following the orb.
+        """)
+
+    gratitude_panel()
+
+    st.markdown("---")
+    st.subheader("Mindfulness Fact of the Day")
+    fact = get_content_bank().daily("fact", get_journal_user_id(), user_inputs['country'])
+    if fact:
+        st.info(f"🧠 {fact['text']}")
+
+    st.markdown("---")
+    if st.session_state.jobs.running("local_info"):
+        health_hub_polling_panel(user_inputs)
+    else:
+        health_hub_panel(user_inputs)
+
+    st.markdown("---")
+    quiz_panel(user_inputs['country'])
+
+with tab3, instrumentation.region("chat_tab"):
+    chat_panel()
+
+
+# --- 5. Session memory budget ---
+enforce_session_budget()
+
+
+instrumentation.end_rerun()
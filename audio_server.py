@@ -0,0 +1,230 @@
+"""Process-wide audio store and a small HTTP side server that streams it.
+
+Tracks are memory-mapped (or held as bytes) once and shared by every
+session. The page only carries a URL. The endpoint supports HEAD, Range
+requests (browsers seek and loop with them), ETags and long-lived caching,
+because URLs are versioned by content hash. Optional /stream/<slug> routes
+send an open-ended body with chunked transfer encoding instead.
+
+Without a public URL the server is only reachable as http://localhost, so
+`reachable_from` tells the app whether a given page can use it at all.
+"""
+import hashlib
+import mmap
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class Track:
+    def __init__(self, slug, data, mime):
+        self.slug = slug
+        self.data = data
+        self.size = len(data)
+        self.mime = mime
+        self.etag = hashlib.sha1(data).hexdigest()[:16]
+
+
+class AudioStore:
+    def __init__(self):
+        self._tracks = {}
+        self._lock = threading.Lock()
+
+    def add_file(self, slug, path, mime="audio/mpeg"):
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._add(Track(slug, data, mime))
+
+    def add_bytes(self, slug, data, mime):
+        return self._add(Track(slug, bytes(data), mime))
+
+    def _add(self, track):
+        with self._lock:
+            self._tracks[track.slug] = track
+        return track
+
+    def get(self, slug):
+        return self._tracks.get(slug)
+
+    def __contains__(self, slug):
+        return slug in self._tracks
+
+
+def is_loopback(host):
+    """True when a Host header ("localhost:8501", "[::1]:8501", ...) names the local machine."""
+    if host.startswith("["):
+        name = host[1:].split("]", 1)[0]
+    else:
+        name = host.split(":", 1)[0] if host.count(":") == 1 else host
+    return name.lower() == "localhost" or name == "::1" or name.startswith("127.")
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single byte range, or None if unsatisfiable."""
+    match = _RANGE_RE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(0, size - int(last))
+        end = size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+class _AudioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        route = self.server.routes.get(self.path.split("?", 1)[0])
+        if route is not None:
+            content_type, body = route()
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+            return
+        match = re.match(r'^/stream/([\w-]+)', self.path)
+        if match and self.server.streams is not None:
+            self._serve_stream(match.group(1), send_body)
+            return
+        match = re.match(r'^/noise/([\w-]+)', self.path)
+        track = self.server.store.get(match.group(1)) if match else None
+        if track is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = f'"{track.etag}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self._common_headers(track, etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, track.size - 1
+        range_header = self.headers.get("Range")
+        if range_header:
+            byte_range = parse_range(range_header, track.size)
+            if byte_range is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{track.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{track.size}")
+        else:
+            self.send_response(200)
+        self._common_headers(track, etag)
+        self.send_header("Content-Type", track.mime)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not send_body:
+            return
+        view = memoryview(track.data)
+        try:
+            for offset in range(start, end + 1, CHUNK_SIZE):
+                self.wfile.write(view[offset:min(offset + CHUNK_SIZE, end + 1)])
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the browser dropped the request (seek, stop, tab closed)
+        finally:
+            view.release()
+
+    def _serve_stream(self, slug, send_body):
+        stream = self.server.streams(slug)
+        if stream is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        content_type, chunks = stream
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        if not send_body:
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        try:
+            for chunk in chunks:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def _common_headers(self, track, etag):
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        self.send_header("Access-Control-Allow-Origin", "*")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AudioServer:
+    def __init__(self, store, host="127.0.0.1", port=8765, public_url=None, routes=None, streams=None):
+        """`routes` maps extra paths (e.g. /metrics) to callables returning (content_type, body_bytes).
+
+        `streams(slug)` returns (content_type, iterable of byte chunks) for /stream/<slug>, or None.
+        """
+        self.store = store
+        try:
+            self._httpd = ThreadingHTTPServer((host, port), _AudioHandler)
+        except OSError:
+            if public_url:
+                raise  # the public URL is routed to this port; another port would serve nothing behind it
+            # Port taken (e.g. a second app process); any free port will do.
+            self._httpd = ThreadingHTTPServer((host, 0), _AudioHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.store = store
+        self._httpd.routes = dict(routes or {})
+        self._httpd.streams = streams
+        self.port = self._httpd.server_address[1]
+        self.proxied = bool(public_url)
+        self.public_url = (public_url or f"http://localhost:{self.port}").rstrip("/")
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="globalwell-audio", daemon=True)
+        self._thread.start()
+
+    def reachable_from(self, page_host):
+        """Whether a browser that loaded the page from `page_host` can fetch this server's URLs."""
+        return self.proxied or is_loopback(page_host)
+
+    def url(self, slug):
+        track = self.store.get(slug)
+        if track is None:
+            return None
+        return f"{self.public_url}/noise/{slug}?v={track.etag}"
+
+    def stream_url(self, slug):
+        return f"{self.public_url}/stream/{slug}"
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
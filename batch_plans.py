@@ -0,0 +1,159 @@
+"""Headless batch wellness-plan generation.
+
+    python batch_plans.py profiles.csv --out plans.jsonl --concurrency 8 --pdf-dir pdfs
+
+Profiles are read from CSV or JSONL with the same fields as the app's
+`user_inputs` (country, state, region, age, gender, diet, activity, health,
+goal, reason) plus an optional id column. Each finished row is appended to the
+output JSONL straight away, so an interrupted run can simply be started again:
+rows already in the output with status "ok" are skipped. Model calls share
+the app's cache, rate limiter and retry policy; PDFs are rendered in a
+process pool.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from llm import client_from_env
+from plan_buckets import BucketedPlanner
+from plan_pdf import write_plan_pdf
+from prompts import PROFILE_FIELDS, get_wellness_plan_prompt, sanitize_input
+from response_cache import DEFAULT_CACHE_PATH
+
+
+def read_profiles(path, id_field="id"):
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    profiles = []
+    for number, row in enumerate(rows, 1):
+        profile = {field: sanitize_input(str(row.get(field) or "")) for field in PROFILE_FIELDS}
+        profiles.append((str(row.get(id_field) or number), profile))
+    return profiles
+
+
+def read_checkpoint(out_path):
+    """Ids already completed in a previous run, with their plans (for missing PDFs)."""
+    done = {}
+    if os.path.exists(out_path):
+        with open(out_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a torn last line from an interrupted run
+                if record.get("status") == "ok":
+                    done[record["id"]] = record.get("plan")
+    return done
+
+
+def pdf_path(pdf_dir, row_id):
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in row_id)
+    return os.path.join(pdf_dir, f"{safe}.pdf")
+
+
+async def run_batch(client, profiles, out_path, concurrency, pdf_pool=None, pdf_dir=None, progress=True,
+                    planner=None):
+    done = read_checkpoint(out_path)
+    todo = [(row_id, profile) for row_id, profile in profiles if row_id not in done]
+    pdf_futures = []
+    if pdf_pool is not None:
+        for row_id, plan in done.items():
+            if plan and not os.path.exists(pdf_path(pdf_dir, row_id)):
+                pdf_futures.append(pdf_pool.submit(write_plan_pdf, pdf_path(pdf_dir, row_id), plan))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.monotonic()
+    counts = {"ok": 0, "error": 0}
+
+    async def generate(row_id, profile):
+        async with semaphore:
+            if not profile["goal"]:
+                return row_id, None, "missing goal", 0.0
+            call_started = time.monotonic()
+            try:
+                if planner is not None:
+                    plan, _ = await asyncio.to_thread(planner.plan, profile)
+                else:
+                    plan = await asyncio.to_thread(client.generate, get_wellness_plan_prompt(profile), "batch_plan")
+                return row_id, plan, None, time.monotonic() - call_started
+            except Exception as e:
+                return row_id, None, f"{type(e).__name__}: {e}", time.monotonic() - call_started
+
+    with open(out_path, "a", encoding="utf-8") as out:
+        for finished in asyncio.as_completed([generate(row_id, profile) for row_id, profile in todo]):
+            row_id, plan, error, latency = await finished
+            status = "error" if error else "ok"
+            counts[status] += 1
+            out.write(json.dumps({"id": row_id, "status": status, "plan": plan, "error": error,
+                                  "latency_ms": round(latency * 1000), "finished_at": time.time()},
+                                 ensure_ascii=False) + "\n")
+            out.flush()
+            if plan and pdf_pool is not None:
+                pdf_futures.append(pdf_pool.submit(write_plan_pdf, pdf_path(pdf_dir, row_id), plan))
+            if progress:
+                elapsed = time.monotonic() - started
+                finished_rows = counts["ok"] + counts["error"]
+                print(f"\r{finished_rows}/{len(todo)} rows, {counts['error']} errors, "
+                      f"{finished_rows / elapsed * 60:.1f} plans/min", end="", file=sys.stderr, flush=True)
+    if progress and todo:
+        print(file=sys.stderr)
+    for future in pdf_futures:
+        future.result()
+    summary = {"skipped": len(done), "ok": counts["ok"], "error": counts["error"], "pdfs": len(pdf_futures),
+               "seconds": round(time.monotonic() - started, 2)}
+    if planner is not None:
+        summary["bucketed"] = planner.stats()
+    if client.telemetry is not None:
+        summary["llm"] = client.telemetry.summary()["total"]
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("profiles", help="CSV or JSONL file of profiles")
+    parser.add_argument("--out", required=True, help="JSONL output; also the resume checkpoint")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum model calls in flight")
+    parser.add_argument("--pdf-dir", help="also write one PDF per plan into this directory")
+    parser.add_argument("--pdf-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--cache-path", default=os.getenv("GLOBALWELL_CACHE_PATH", DEFAULT_CACHE_PATH))
+    parser.add_argument("--bucketed", action="store_true",
+                        help="share one base plan per profile bucket and personalize it with a short follow-up")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    client = client_from_env(args.cache_path)
+    profiles = read_profiles(args.profiles, args.id_field)
+
+    pdf_pool = None
+    if args.pdf_dir:
+        os.makedirs(args.pdf_dir, exist_ok=True)
+        pdf_pool = ProcessPoolExecutor(max_workers=args.pdf_workers)
+    try:
+        summary = asyncio.run(run_batch(client, profiles, args.out, args.concurrency,
+                                        pdf_pool=pdf_pool, pdf_dir=args.pdf_dir, progress=not args.quiet,
+                                        planner=BucketedPlanner(partial(client.generate, feature="batch_plan"))
+                                        if args.bucketed else None))
+    finally:
+        if pdf_pool is not None:
+            pdf_pool.shutdown()
+    print(json.dumps(summary))
+    return 1 if summary["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Tail latency of model calls with and without hedging, against the fake backend.
+
+Each run sends the same mix of calls (streamed chat and plan requests, blocking
+local-info lookups) through an `LLMClient` on a `FakeBackend` whose latency
+has a straggler tail, once plain and once with a `Hedger`:
+
+    python benchmarks/hedging_bench.py --calls 600 --tail-rate 0.02 --tail-latency 2
+
+Reports p50/p95/p99 per feature, upstream calls per request (the price of
+hedging) and the hedger's counters. The first --warmup calls of each run only
+fill the latency history and are not measured.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from startup_bench import ROOT, summarize
+
+
+FEATURES = [("chat", "stream"), ("wellness_plan", "stream"), ("local_info", "generate")]
+
+
+def run_mix(client, calls, concurrency, offset):
+    latencies = {feature: [] for feature, _ in FEATURES}
+
+    def one(i):
+        feature, mode = FEATURES[i % len(FEATURES)]
+        prompt = f"{feature} request {offset + i}"
+        started = time.perf_counter()
+        if mode == "stream":
+            for _ in client.stream(prompt, feature=feature):
+                pass
+        else:
+            client.generate(prompt, feature=feature)
+        latencies[feature].append((time.perf_counter() - started) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(calls)))
+    return latencies
+
+
+def run(args, hedged):
+    from hedging import HedgeBudget, Hedger, LatencyTracker
+    from llm import FakeBackend, LLMClient
+
+    backend = FakeBackend(latency=args.latency, jitter=args.jitter, chunk_delay=args.chunk_delay, seed=args.seed,
+                          tail_rate=args.tail_rate, tail_latency=args.tail_latency)
+    hedger = None
+    if hedged:
+        hedger = Hedger(tracker=LatencyTracker(min_samples=args.min_samples), budget=HedgeBudget(ratio=args.budget),
+                        quantile=args.quantile, min_delay=args.min_delay)
+    client = LLMClient(backend, hedging=hedger)
+    run_mix(client, args.warmup, args.concurrency, offset=0)
+    warmup_calls = backend.calls
+    stats_before = hedger.stats() if hedger else None
+    latencies = run_mix(client, args.calls, args.concurrency, offset=args.warmup)
+    result = {
+        "latency_ms": {feature: summarize(samples) for feature, samples in latencies.items()},
+        "overall_ms": summarize([ms for samples in latencies.values() for ms in samples]),
+        "upstream_per_call": round((backend.calls - warmup_calls) / args.calls, 3),
+    }
+    if hedger:
+        result["hedging"] = {k: v - stats_before[k] for k, v in hedger.stats().items() if k != "hedge_ratio"}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=600, help="measured calls per run")
+    parser.add_argument("--warmup", type=int, default=150, help="unmeasured calls that fill the latency history")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.1, help="fake LLM time to first token (s)")
+    parser.add_argument("--jitter", type=float, default=0.03)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.02, help="share of straggler calls")
+    parser.add_argument("--tail-latency", type=float, default=2.0, help="extra delay of a straggler (s)")
+    parser.add_argument("--quantile", type=float, default=0.95, help="hedge after this latency quantile")
+    parser.add_argument("--budget", type=float, default=0.1, help="hedges allowed per call")
+    parser.add_argument("--min-delay", type=float, default=0.01)
+    parser.add_argument("--min-samples", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+    sys.path.insert(0, ROOT)
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "plain": run(args, hedged=False),
+        "hedged": run(args, hedged=True),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
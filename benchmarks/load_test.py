@@ -0,0 +1,269 @@
+"""Multi-session load test for app.py.
+
+Simulates N concurrent sessions in one process (the way one Streamlit node
+serves them: shared cache_resource singletons, per-session state), each
+running a realistic script against the fake LLM backend:
+
+    open the app -> generate a plan -> start/stop noise -> save gratitude
+    -> ask chat questions -> take the quiz
+
+    python benchmarks/load_test.py --sessions 20 --latency 0.8 --json load.json
+
+Reports p50/p95/p99 rerun latency (overall and per step), reruns per second,
+the serialized size of every rerun's element tree (what the browser receives
+over the websocket), and process RSS per session. Results are written as JSON
+so runs can be compared; --max-p95-ms makes it usable as a CI gate.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from startup_bench import APP_PATH, ROOT, summarize
+
+
+GOALS = ["Sleep better and have more energy", "Lose weight", "Reduce stress at work", "Build muscle at home",
+         "Eat healthier on a budget", "Run my first 5k"]
+QUESTIONS = ["What should I eat for breakfast?", "How can I sleep better on weekends?",
+             "Can I replace running with cycling?", "How much water should I drink each day?",
+             "What can I do when I feel stressed at work?"]
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is a peak, in KiB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def payload_bytes(at):
+    """Serialized size of the rendered element tree, an estimate of the rerun's websocket payload."""
+    total = 0
+    stack = [at._tree]
+    while stack:
+        node = stack.pop()
+        proto = getattr(node, "proto", None)
+        if proto is not None and hasattr(proto, "ByteSize"):
+            total += proto.ByteSize()
+        children = getattr(node, "children", None)
+        if isinstance(children, dict):
+            stack.extend(children.values())
+    return total
+
+
+def by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"no widget labelled {label!r} (found {[e.label for e in elements]})")
+
+
+class Session:
+    def __init__(self, index, rng, timeout, questions, think_seconds):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.rng = rng
+        self.questions = questions
+        self.think_seconds = think_seconds
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.samples = []  # (step, ms, payload bytes)
+        self.errors = []
+
+    def run(self, step):
+        if self.think_seconds:
+            time.sleep(self.rng.uniform(0, 2 * self.think_seconds))
+        started = time.perf_counter()
+        try:
+            self.at.run()
+        except Exception as e:
+            self.errors.append(f"{step}: {type(e).__name__}: {e}")
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        if self.at.exception:
+            self.errors.append(f"{step}: {self.at.exception[0].message}")
+        self.samples.append((step, elapsed, payload_bytes(self.at)))
+
+    def script(self):
+        at = self.at
+        self.run("open")
+        at.text_area[0].input(f"{self.rng.choice(GOALS)} (session {self.index})")
+        by_label(at.button, "Generate My Wellness Plan").click()
+        self.run("generate_plan")
+
+        by_label(at.button, "Start Noise").click()
+        self.run("start_noise")
+        by_label(at.button, "Stop Noise").click()
+        self.run("stop_noise")
+
+        by_label(at.text_input, "1) Something I'm grateful for").input("Morning tea")
+        by_label(at.text_input, "2) Another thing I'm grateful for").input(f"A call with friend {self.index}")
+        by_label(at.text_input, "3) One small win today").input("Took the stairs")
+        by_label(at.button, "Save Today's Gratitude").click()
+        self.run("save_gratitude")
+
+        for question in self.rng.sample(QUESTIONS, self.questions):
+            by_label(at.text_area, "Have a question about your plan?").input(question)
+            by_label(at.button, "Ask Question").click()
+            self.run("chat")
+
+        quiz = at.radio(key="quiz_answer")  # the question rotates daily
+        quiz.set_value(quiz.options[0])
+        by_label(at.button, "Check Answer").click()
+        self.run("quiz")
+        self.run("idle")
+
+
+def share_apptest_runtime():
+    """Let AppTest instances run side by side in one process, the way one server runs sessions.
+
+    AppTest assumes one app at a time. Each run installs a mock Runtime and sets it back to None when it
+    finishes, and it turns on the global.appTest option (which records widget values for the test) only
+    for the run and restores it afterwards. Either pulls state out from under sessions still running. Each
+    run also recompiles the script, and CPython 3.11's parser is not safe to call from several threads. So
+    keep the last installed runtime available, keep global.appTest on for the whole load, and compile the
+    script once under a lock, as a real server's shared ScriptCache does.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    installed = {}
+    default_instance = Runtime.instance.__func__
+
+    def instance(cls):
+        if cls._instance is not None:
+            installed["runtime"] = cls._instance
+            return cls._instance
+        return installed["runtime"] if installed else default_instance(cls)
+
+    compiled = {}
+    compile_lock = threading.Lock()
+    default_get_bytecode = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in compiled:
+                compiled[script_path] = default_get_bytecode(self, script_path)
+            return compiled[script_path]
+
+    Runtime.instance = classmethod(instance)
+    ScriptCache.get_bytecode = get_bytecode
+    config.set_option("global.appTest", True)
+
+
+def run_load(sessions, questions, timeout, think_seconds, seed):
+    from streamlit.testing.v1 import AppTest
+
+    share_apptest_runtime()
+    # One cold run first, so imports and process-wide singletons aren't billed to the sessions.
+    warmup_started = time.perf_counter()
+    AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    cold_ms = (time.perf_counter() - warmup_started) * 1000
+    rss_before = rss_bytes()
+    peak = {"rss": rss_before}
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.wait(0.2):
+            peak["rss"] = max(peak["rss"], rss_bytes())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    users = [Session(i, random.Random(seed + i), timeout, questions, think_seconds) for i in range(sessions)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(user.script) for user in users]
+        for user, future in zip(users, futures):
+            try:
+                future.result()
+            except Exception as e:  # a widget lookup failed; the samples taken so far still count
+                user.errors.append(f"script: {type(e).__name__}: {e}")
+    wall = time.perf_counter() - started
+    stop.set()
+    rss_after = rss_bytes()  # sessions (and their AppTests) are still alive here
+
+    samples = [s for user in users for s in user.samples]
+    steps = {}
+    for step, ms, size in samples:
+        steps.setdefault(step, {"ms": [], "bytes": []})
+        steps[step]["ms"].append(ms)
+        steps[step]["bytes"].append(size)
+    latencies = [ms for _, ms, _ in samples]
+    sizes = [size for _, _, size in samples]
+    return {
+        "cold_run_ms": round(cold_ms, 2),
+        "reruns": len(samples),
+        "wall_seconds": round(wall, 2),
+        "reruns_per_second": round(len(samples) / wall, 2) if wall else 0.0,
+        "latency_ms": summarize(latencies) if latencies else None,
+        "steps": {step: {"latency_ms": summarize(v["ms"]),
+                         "payload_bytes": {"mean": round(sum(v["bytes"]) / len(v["bytes"])), "max": max(v["bytes"])}}
+                  for step, v in steps.items()},
+        "payload_bytes": {"mean": round(sum(sizes) / len(sizes)) if sizes else 0, "max": max(sizes, default=0),
+                          "total": sum(sizes)},
+        "rss_bytes": {"before": rss_before, "after": rss_after, "peak": peak["rss"],
+                      "per_session": round((rss_after - rss_before) / sessions)},
+        "errors": [e for user in users for e in user.errors],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--questions", type=int, default=2, help="chat questions per session")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake LLM time to first token (s)")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="fake LLM delay between streamed chunks (s)")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a session's actions")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if the overall p95 rerun latency is higher")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="globalwell-load-")
+    os.environ.update({
+        "GLOBALWELL_LLM_BACKEND": "fake",
+        "GLOBALWELL_FAKE_LATENCY": str(args.latency),
+        "GLOBALWELL_FAKE_JITTER": str(args.jitter),
+        "GLOBALWELL_FAKE_CHUNK_DELAY": str(args.chunk_delay),
+        "GLOBALWELL_FAKE_SEED": str(args.seed),
+    })
+    for name, default in (("GLOBALWELL_CACHE_PATH", "responses.sqlite3"), ("GLOBALWELL_JOURNAL_PATH", "journal.sqlite3"),
+                          ("GLOBALWELL_INSIGHTS_PATH", "insights.sqlite3"), ("GLOBALWELL_BLOB_PATH", "blobs.sqlite3"),
+                          ("GLOBALWELL_CONTENT_PATH", "content_bank.jsonl")):
+        os.environ.setdefault(name, os.path.join(workdir, default))
+    os.environ.setdefault("GLOBALWELL_AUDIO_PORT", "0")
+    os.environ.setdefault("GLOBALWELL_RATE_LIMIT_RPM", "100000")
+    sys.path.insert(0, ROOT)
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "max_p95_ms")},
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        **run_load(args.sessions, args.questions, args.timeout, args.think_ms / 1000, args.seed),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if results["errors"]:
+        print(f"{len(results['errors'])} errors during the run", file=sys.stderr)
+    if args.max_p95_ms is not None and results["latency_ms"]["p95_ms"] > args.max_p95_ms:
+        print(f"p95 rerun {results['latency_ms']['p95_ms']} ms exceeds {args.max_p95_ms} ms", file=sys.stderr)
+        return 1
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Cold-start and rerun timing benchmark for app.py.
+
+Runs entirely offline against the fake LLM backend:
+
+    python benchmarks/startup_bench.py --reruns 30 --json startup.json --max-rerun-ms 300
+
+Reports module import times (measured in a fresh interpreter), the first
+(cold) script run and steady-state reruns with and without a generated plan.
+Exits non-zero when the median rerun exceeds --max-rerun-ms, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+timings = {{}}
+for module in {modules!r}:
+    start = time.perf_counter()
+    __import__(module)
+    timings[module] = round((time.perf_counter() - start) * 1000, 2)
+timings["reportlab_loaded"] = "reportlab" in sys.modules
+print(json.dumps(timings))
+"""
+
+APP_MODULES = ["streamlit", "dotenv", "response_cache", "llm", "resilience", "chat_context",
+               "audio_server", "plan_doc", "plan_pdf", "jobs", "journal_store", "theme", "prompts",
+               "local_insights", "chat_cache", "noise_engine", "session_budget",
+               "plan_buckets", "llm_telemetry", "timer_component", "content_bank", "hedging"]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "p50_ms": round(percentile(samples, 0.50), 2),
+        "p95_ms": round(percentile(samples, 0.95), 2),
+        "p99_ms": round(percentile(samples, 0.99), 2),
+        "max_ms": round(max(samples), 2),
+        "mean_ms": round(statistics.fmean(samples), 2),
+    }
+
+
+def measure_imports():
+    code = IMPORT_PROBE.format(root=ROOT, modules=APP_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception}")
+    return elapsed
+
+
+def measure_reruns(reruns, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    cold_ms = timed_run(at)
+    idle = [timed_run(at) for _ in range(reruns)]
+
+    at.text_area[0].input("Sleep better and have more energy")
+    next(b for b in at.button if b.label == "Generate My Wellness Plan").click()
+    generate_ms = timed_run(at)
+    with_plan = [timed_run(at) for _ in range(reruns)]
+    return {
+        "cold_run_ms": round(cold_ms, 2),
+        "generate_run_ms": round(generate_ms, 2),
+        "rerun_idle": summarize(idle),
+        "rerun_with_plan": summarize(with_plan),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--max-rerun-ms", type=float, help="fail if the median rerun with a plan is slower")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="globalwell-bench-")
+    os.environ.setdefault("GLOBALWELL_LLM_BACKEND", "fake")
+    for name, default in (("GLOBALWELL_CACHE_PATH", "responses.sqlite3"), ("GLOBALWELL_JOURNAL_PATH", "journal.sqlite3"),
+                          ("GLOBALWELL_INSIGHTS_PATH", "insights.sqlite3"), ("GLOBALWELL_BLOB_PATH", "blobs.sqlite3"),
+                          ("GLOBALWELL_CONTENT_PATH", "content_bank.jsonl")):
+        os.environ.setdefault(name, os.path.join(workdir, default))
+    os.environ.setdefault("GLOBALWELL_AUDIO_PORT", "0")
+    sys.path.insert(0, ROOT)
+
+    results = {"imports_ms": measure_imports(), **measure_reruns(args.reruns, args.timeout)}
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.max_rerun_ms is not None and results["rerun_with_plan"]["p50_ms"] > args.max_rerun_ms:
+        print(f"Median rerun {results['rerun_with_plan']['p50_ms']} ms exceeds {args.max_rerun_ms} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Near-duplicate question cache for plan chat.
+
+Answers are scoped to a plan hash. Questions are compared locally: each is
+normalized and shingled into word unigrams/bigrams plus character trigrams,
+and summarized by a MinHash signature. LSH banding over the signatures finds
+candidates without scanning every cached question, and candidates are then
+checked against the tunable Jaccard threshold on the actual shingle sets.
+
+Shingle overlap alone can't tell "what should I eat for breakfast" from
+"... for dinner", so a match also requires the same set of content words
+(stopwords dropped, plurals folded); only phrasing may differ. Short
+questions ("why?", "and dinner?") lean on the conversation rather than the
+plan and are never served from the cache.
+
+The cache is process-wide, so callers should only `put` complete answers
+that were built from the plan alone (a chat's first turn); answers that draw
+on one user's earlier turns or summary must not reach other sessions. For
+the same reason only a first turn should `lookup`: a follow-up needs an answer
+that knows the conversation so far.
+"""
+import hashlib
+import random
+import re
+import threading
+from collections import OrderedDict
+
+
+_MERSENNE = (1 << 61) - 1
+_WORD_RE = re.compile(r"[^\W_]+")
+_STOPWORDS = frozenset("""
+a about am an and any are as at be been being but by can could do does doing for from had has have how i if
+in into is it its just me my of ok okay on or our should so some than that the their them then there these
+they this to too was we what when where which while who why will with would you your each every much many
+please need want get
+""".split())
+
+
+def normalize_question(text):
+    return " ".join(_WORD_RE.findall((text or "").casefold()))
+
+
+def shingles(normalized):
+    words = normalized.split()
+    grams = set(words)
+    grams.update(" ".join(pair) for pair in zip(words, words[1:]))
+    padded = f" {normalized} "
+    grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def keywords(normalized):
+    return frozenset(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+                     for w in normalized.split() if w not in _STOPWORDS)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash64(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class MinHasher:
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+
+    def signature(self, grams):
+        hashes = [_hash64(g) for g in grams]
+        return tuple(min((a * h + b) % _MERSENNE for h in hashes) for a, b in self.params)
+
+
+class _Entry:
+    __slots__ = ("question", "normalized", "grams", "keywords", "answer", "bands")
+
+    def __init__(self, question, normalized, grams, keywords, answer, bands):
+        self.question = question
+        self.normalized = normalized
+        self.grams = grams
+        self.keywords = keywords
+        self.answer = answer
+        self.bands = bands
+
+
+class _PlanIndex:
+    def __init__(self):
+        self.entries = OrderedDict()  # id -> _Entry, oldest first
+        self.exact = {}               # normalized question -> id
+        self.buckets = {}             # (band number, band values) -> set of ids
+        self.next_id = 0
+
+
+class ChatAnswerCache:
+    def __init__(self, threshold=0.7, min_words=3, num_perm=64, bands=16, max_entries_per_plan=5000,
+                 max_plans=256):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.min_words = min_words
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_entries_per_plan = max_entries_per_plan
+        self.max_plans = max_plans
+        self._hasher = MinHasher(num_perm)
+        self._plans = OrderedDict()  # plan hash -> _PlanIndex, least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "exact_hits": 0, "misses": 0, "skipped": 0, "writes": 0}
+
+    def _prepare(self, question):
+        normalized = normalize_question(question)
+        if len(normalized.split()) < self.min_words:
+            return None
+        grams = shingles(normalized)
+        signature = self._hasher.signature(grams)
+        bands = tuple((i, signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands))
+        return normalized, grams, keywords(normalized), bands
+
+    def lookup(self, plan_key, question):
+        """Return (answer, similarity) for a near-duplicate question on this plan, else None."""
+        prepared = self._prepare(question)
+        with self._lock:
+            if prepared is None:
+                self._stats["skipped"] += 1
+                return None
+            normalized, grams, words, bands = prepared
+            index = self._plans.get(plan_key)
+            if index is not None:
+                self._plans.move_to_end(plan_key)
+                entry_id = index.exact.get(normalized)
+                if entry_id is not None:
+                    self._stats["hits"] += 1
+                    self._stats["exact_hits"] += 1
+                    return index.entries[entry_id].answer, 1.0
+                candidates = set()
+                for band in bands:
+                    candidates.update(index.buckets.get(band, ()))
+                best, best_score = None, self.threshold
+                for entry_id in candidates:
+                    entry = index.entries[entry_id]
+                    if entry.keywords != words:
+                        continue
+                    score = jaccard(grams, entry.grams)
+                    if score >= best_score:
+                        best, best_score = entry, score
+                if best is not None:
+                    self._stats["hits"] += 1
+                    return best.answer, best_score
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, plan_key, question, answer):
+        prepared = self._prepare(question)
+        if prepared is None or not answer:
+            return
+        normalized, grams, words, bands = prepared
+        with self._lock:
+            index = self._plans.get(plan_key)
+            if index is None:
+                index = self._plans[plan_key] = _PlanIndex()
+                while len(self._plans) > self.max_plans:
+                    self._plans.popitem(last=False)
+            self._plans.move_to_end(plan_key)
+            if normalized in index.exact:
+                self._remove(index, index.exact[normalized])
+            entry_id = index.next_id
+            index.next_id += 1
+            index.entries[entry_id] = _Entry(question, normalized, grams, words, answer, bands)
+            index.exact[normalized] = entry_id
+            for band in bands:
+                index.buckets.setdefault(band, set()).add(entry_id)
+            while len(index.entries) > self.max_entries_per_plan:
+                self._remove(index, next(iter(index.entries)))
+            self._stats["writes"] += 1
+
+    def _remove(self, index, entry_id):
+        entry = index.entries.pop(entry_id)
+        index.exact.pop(entry.normalized, None)
+        for band in entry.bands:
+            bucket = index.buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del index.buckets[band]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["plans"] = len(self._plans)
+            stats["entries"] = sum(len(index.entries) for index in self._plans.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,156 @@
+"""Token-budgeted prompt builder for the plan chat.
+
+Prompt layout, most stable part first:
+
+    instructions                 (identical for every turn)
+    rolling summary of old turns (changes only when a summary job lands)
+    plan: the sections the question is about (the caller picks them; the
+          whole plan when none stand out), clipped to a fixed `plan_tokens`
+    recent turns verbatim
+    the new question
+
+Only the relevant part of the plan is sent, so a sleep question doesn't pay
+for the nutrition section. That part changes with the question, so it comes
+after the instructions and summary rather than inside the stable prefix.
+
+Older turns are folded into the summary by a background job; until it lands
+they are included as short one-line notes so nothing silently disappears.
+"""
+import threading
+
+
+CHAT_PREFIX = (
+    "You are GlobalWell AI, an empathetic AI Wellness Buddy. Answer the user's questions about "
+    "their personalized wellness plan below. Stay practical and low-cost, and never recommend "
+    "specific supplements, medicines or drugs.\n\n"
+)
+
+SUMMARY_PROMPT = """Update the running summary of a chat between a user and GlobalWell AI about their wellness plan.
+Keep it under {max_words} words. Keep facts the user shared about themselves, their questions and the advice given.
+
+Current summary:
+{summary}
+
+New conversation turns:
+{turns}
+
+Updated summary:"""
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting English prose.
+    return (len(text) + 3) // 4 if text else 0
+
+
+def format_turn(message):
+    speaker = "User" if message["role"] == "user" else "GlobalWell AI"
+    return f"{speaker}: {message['content']}"
+
+
+def _clip(text, max_tokens):
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+class ChatMemory:
+    """Per-session rolling summary of the turns that fell out of the recent window."""
+
+    def __init__(self):
+        self.summary = ""
+        self.summarized_upto = 0  # number of chat_history messages folded into `summary`
+        self._pending = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return self.summary, self.summarized_upto
+
+    def _apply(self, summary, upto):
+        with self._lock:
+            if upto > self.summarized_upto:
+                self.summary = summary.strip()
+                self.summarized_upto = upto
+            self._pending = None
+
+    def schedule_summary(self, history, keep_recent, summarize, executor, max_words=120):
+        """Fold everything older than the last `keep_recent` messages into the summary, off-thread."""
+        upto = max(0, len(history) - keep_recent)
+        with self._lock:
+            if upto <= self.summarized_upto or self._pending is not None:
+                return None
+            start, summary = self.summarized_upto, self.summary
+            turns = "\n".join(format_turn(m) for m in history[start:upto] if m.get("content"))
+
+            def job():
+                try:
+                    new_summary = summarize(SUMMARY_PROMPT.format(
+                        max_words=max_words, summary=summary or "(none yet)", turns=turns))
+                except Exception:
+                    new_summary = None
+                if new_summary:
+                    self._apply(new_summary, upto)
+                else:
+                    with self._lock:
+                        self._pending = None
+
+            self._pending = executor.submit(job)
+            return self._pending
+
+
+class ChatContextBuilder:
+    def __init__(self, budget_tokens=6000, recent_messages=6, note_tokens=30, plan_tokens=None):
+        self.budget_tokens = budget_tokens
+        # Fixed, so a long plan is clipped the same way on every turn however the history grows.
+        self.plan_tokens = budget_tokens // 2 if plan_tokens is None else plan_tokens
+        self.recent_messages = recent_messages
+        self.note_tokens = note_tokens
+
+    def build(self, plan, history, question, memory=None):
+        """`plan` is the plan text to answer from, usually just the sections relevant to `question`."""
+        summary, summarized_upto = memory.snapshot() if memory else ("", 0)
+        tail = f"User question: {question}\nAnswer:"
+
+        plan = f"Wellness plan:\n{_clip(plan, self.plan_tokens)}\n\n"
+        remaining = self.budget_tokens - estimate_tokens(tail) - estimate_tokens(CHAT_PREFIX) - estimate_tokens(plan)
+        if summary:
+            summary = _clip(summary, max(0, remaining // 4))
+            remaining -= estimate_tokens(summary)
+
+        # Turns before summarized_upto are covered by the summary (and may have been spilled out of the session).
+        # Newest turns first, verbatim, until the recent window or the budget runs out.
+        recent_start = max(summarized_upto, len(history) - self.recent_messages)
+        recent = []
+        included = 0
+        for message in reversed(history[recent_start:]):
+            included += 1
+            if not message.get("content"):
+                continue
+            line = format_turn(message)
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                included -= 1
+                break
+            recent.insert(0, line)
+            remaining -= cost
+        recent_start = len(history) - included
+
+        # Turns not yet covered by the summary or the recent window become short notes.
+        notes = []
+        for message in reversed(history[summarized_upto:recent_start]):
+            if not message.get("content"):
+                continue
+            note = "- " + _clip(format_turn(message), self.note_tokens)
+            cost = estimate_tokens(note)
+            if cost > remaining:
+                break
+            notes.insert(0, note)
+            remaining -= cost
+
+        parts = [CHAT_PREFIX]
+        if summary or notes:
+            parts.append("Earlier in this conversation:\n" + "\n".join(filter(None, [summary] + notes)) + "\n\n")
+        parts.append(plan)
+        if recent:
+            parts.append("Recent conversation:\n" + "\n".join(recent) + "\n\n")
+        parts.append(tail)
+        return "".join(parts)
@@ -0,0 +1,232 @@
+// GlobalWell timer component: Pomodoro + breathing orb ("pomodoro" view) and the looping chime ("chime" view).
+//
+// Speaks the Streamlit component protocol over postMessage directly, so there is no build step. The iframe
+// stays mounted across reruns; every render only delivers new args, and this script keeps the timer, the
+// AudioContext and the chime loop alive in between. Python hears back only when the timer changes phase.
+(function () {
+  "use strict";
+
+  var view = null;
+  var colors = null;
+
+  function send(type, data) {
+    var message = { isStreamlitMessage: true, type: type };
+    for (var k in data) message[k] = data[k];
+    window.parent.postMessage(message, "*");
+  }
+
+  function setHeight() {
+    send("streamlit:setFrameHeight", { height: view === "pomodoro" ? document.body.scrollHeight : 0 });
+  }
+
+  function applyColors(next) {
+    if (!next || JSON.stringify(next) === JSON.stringify(colors)) return;
+    colors = next;
+    for (var name in colors) document.documentElement.style.setProperty("--" + name, colors[name]);
+  }
+
+  // --- Audio (one AudioContext per iframe, for its whole life) ---
+  var audio = null;
+
+  function ensureAudio() {
+    if (!audio) {
+      var Context = window.AudioContext || window.webkitAudioContext;
+      if (!Context) return null;
+      var ctx = new Context();
+      var master = ctx.createGain();
+      master.gain.value = 1;
+      master.connect(ctx.destination);
+      audio = { ctx: ctx, master: master };
+    }
+    if (audio.ctx.state === "suspended") audio.ctx.resume();
+    return audio;
+  }
+
+  function playTone(seconds, onended) {
+    var a = ensureAudio();
+    if (!a) return null;
+    var t = a.ctx.currentTime;
+    var osc = a.ctx.createOscillator();
+    var gain = a.ctx.createGain();
+    osc.type = "sine";
+    osc.frequency.setValueAtTime(660, t);
+    gain.gain.setValueAtTime(0.13, t);
+    gain.gain.linearRampToValueAtTime(0.05, t + seconds * 0.75);
+    gain.gain.linearRampToValueAtTime(0.0, t + seconds);
+    osc.connect(gain);
+    gain.connect(a.master);
+    osc.onended = function () {
+      gain.disconnect();
+      if (onended) onended();
+    };
+    osc.start(t);
+    osc.stop(t + seconds);
+    return osc;
+  }
+
+  // --- Chime view ---
+  var chime = { playing: false, seconds: 10, osc: null };
+
+  function loopChime() {
+    if (!chime.playing) return;
+    chime.osc = playTone(chime.seconds, loopChime);
+  }
+
+  function applyChime(args) {
+    if (!args) return;
+    chime.seconds = Math.max(1, args.duration_sec || 10);
+    if (args.playing && !chime.playing) {
+      chime.playing = true;
+      loopChime();
+    } else if (!args.playing && chime.playing) {
+      chime.playing = false;
+      if (chime.osc) {
+        try { chime.osc.stop(); } catch (e) { /* already stopped */ }
+        chime.osc = null;
+      }
+    }
+  }
+
+  // --- Pomodoro view ---
+  var orb = document.getElementById("orb");
+  var timerEl = document.getElementById("timer");
+  var schedule = null;
+  var ticker = null;
+  var lastCommand = null;
+  var lastPhase = null;
+
+  // The start time is remembered per command in sessionStorage, so a re-created iframe resumes the same
+  // session instead of restarting it, and the browser's own clock is the only one involved.
+  function startedAt(command) {
+    var key = "gw-timer-" + command.id;
+    try {
+      var stored = window.sessionStorage.getItem(key);
+      if (stored) return Number(stored);
+      window.sessionStorage.setItem(key, String(Date.now()));
+    } catch (e) { /* storage blocked: fall back to now */ }
+    return Date.now();
+  }
+
+  function phaseAt(now) {
+    var t = now - schedule.startedAt;
+    for (var round = 1; round <= schedule.rounds; round++) {
+      if (t < schedule.workMs) return { phase: "work", round: round, remaining: schedule.workMs - t };
+      t -= schedule.workMs;
+      if (round === schedule.rounds) break; // no break after the last round
+      if (t < schedule.breakMs) return { phase: "break", round: round, remaining: schedule.breakMs - t };
+      t -= schedule.breakMs;
+    }
+    return { phase: "done", round: schedule.rounds, remaining: 0 };
+  }
+
+  function pad(n) {
+    return String(n).padStart(2, "0");
+  }
+
+  function clock(ms) {
+    var s = Math.ceil(ms / 1000);
+    return pad(Math.floor(s / 60)) + ":" + pad(s % 60);
+  }
+
+  function show(state) {
+    orb.className = "breathing-circle " + state.phase;
+    if (state.phase === "work") {
+      timerEl.textContent = "🧑‍💻 Work " + clock(state.remaining) + "  ·  round " + state.round + "/" + schedule.rounds;
+    } else if (state.phase === "break") {
+      timerEl.textContent = "☕ Break " + clock(state.remaining) + "  ·  round " + state.round + "/" + schedule.rounds;
+    } else if (state.phase === "done") {
+      timerEl.textContent = "✅ Pomodoro Complete — great job!";
+    } else {
+      timerEl.textContent = "Ready when you are.";
+    }
+  }
+
+  function report(state) {
+    send("streamlit:setComponentValue", {
+      dataType: "json",
+      value: {
+        command: lastCommand,
+        phase: state.phase,
+        round: state.round,
+        remaining_ms: Math.round(state.remaining),
+      },
+    });
+  }
+
+  function confetti() {
+    var layer = document.createElement("div");
+    layer.className = "confetti";
+    for (var i = 0; i < 60; i++) {
+      var piece = document.createElement("span");
+      piece.textContent = "🎉";
+      piece.style.left = Math.random() * 100 + "%";
+      piece.style.fontSize = 12 + Math.random() * 18 + "px";
+      piece.style.animationDelay = Math.random() * 600 + "ms";
+      layer.appendChild(piece);
+    }
+    document.body.appendChild(layer);
+    setTimeout(function () { layer.remove(); }, 1600);
+  }
+
+  function stopTicker() {
+    if (ticker !== null) clearInterval(ticker);
+    ticker = null;
+  }
+
+  function tick() {
+    var state = phaseAt(Date.now());
+    show(state);
+    var phase = state.phase + ":" + state.round;
+    if (phase !== lastPhase) {
+      if (lastPhase !== null) {
+        playTone(1.2);
+        if (state.phase === "done") confetti();
+      }
+      lastPhase = phase;
+      report(state);
+    }
+    if (state.phase === "done") stopTicker();
+  }
+
+  function applyCommand(command) {
+    if (!command || command.id === lastCommand) return;
+    lastCommand = command.id;
+    stopTicker();
+    lastPhase = null;
+    if (command.action === "start") {
+      schedule = {
+        startedAt: startedAt(command),
+        workMs: command.work_ms,
+        breakMs: command.break_ms,
+        rounds: command.rounds,
+      };
+      tick();
+      if (ticker === null && phaseAt(Date.now()).phase !== "done") ticker = setInterval(tick, 250);
+    } else {
+      schedule = null;
+      var idle = { phase: "idle", round: 0, remaining: 0 };
+      show(idle);
+      report(idle);
+    }
+  }
+
+  // --- Streamlit protocol ---
+  window.addEventListener("message", function (event) {
+    var data = event.data;
+    if (!data || data.type !== "streamlit:render") return;
+    var args = data.args || {};
+    if (view === null) {
+      view = args.view;
+      document.getElementById("pomodoro").hidden = view !== "pomodoro";
+    }
+    applyColors(args.colors);
+    if (view === "pomodoro") {
+      applyCommand(args.command);
+    } else {
+      applyChime(args.chime);
+    }
+    setHeight();
+  });
+
+  send("streamlit:componentReady", { apiVersion: 1 });
+})();
@@ -0,0 +1,294 @@
+"""Bank of daily tips, mindfulness facts and quiz questions.
+
+Items are stored as JSON lines grouped by (kind, country), next to an index
+holding the byte offset of every line. Both files are memory-mapped, so a
+lookup is one offset read and one line read, O(1) however big the bank is,
+and opening it parses nothing but a small header:
+
+    content_bank.jsonl   {"id", "kind", "country", "text"}
+                         quiz items: "question", "options", "answer", "explanation"
+    content_bank.idx     8-byte header length, JSON header {"groups": {"tip|india": [start, count]}, ...},
+                         padding, then one little-endian uint64 offset per line
+
+Rotation is deterministic: each user starts at their own point in every group
+and steps through it one item per day with a stride coprime to the group size,
+so no item repeats for them until the group is used up. A country with its own
+items gets those; every other country gets the global ("") ones.
+
+The bank is filled offline by batched generation, many items per model call,
+through the same cached, rate-limited client as the app:
+
+    python content_bank.py --countries India,Kenya,Brazil --tips 2000 --facts 1000 --quizzes 500
+
+Until a bank has been built the app serves the built-in SEED_ITEMS.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from local_insights import normalize_place
+from prompts import CONTENT_KINDS, get_content_batch_prompt
+
+
+DEFAULT_CONTENT_PATH = os.path.join(".globalwell_data", "content_bank.jsonl")
+TOPICS = ("nutrition", "physical activity", "sleep", "stress and mood", "hydration", "habits and focus",
+          "social connection", "time outdoors")
+
+_LENGTH = struct.Struct("<Q")
+
+SEED_ITEMS = [
+    {"kind": "tip", "text": "A 5-minute walk after meals helps stabilize energy."},
+    {"kind": "tip", "text": "Stack habits: tie water sips to app switches or calls."},
+    {"kind": "tip", "text": "Slow your exhale: 4-in / 6-out reduces stress fast."},
+    {"kind": "tip", "text": "Keep fruit visible; you’ll eat it more."},
+    {"kind": "tip", "text": "Protect sleep: same wake-up time every day."},
+    {"kind": "fact", "text": "Long exhale stimulates the parasympathetic (calming) response."},
+    {"kind": "fact", "text": "Light morning sunlight helps anchor your body clock."},
+    {"kind": "fact", "text": "Journaling for 5 minutes can reduce rumination."},
+    {"kind": "fact", "text": "Walking meetings boost creativity in many small studies."},
+    {"kind": "fact", "text": "A tidy desk can reduce cognitive load and decision fatigue."},
+    {"kind": "quiz", "question": "Which habit most reliably improves sleep quality over time?",
+     "options": ["Taking long daytime naps", "Keeping a consistent wake-up time",
+                 "Drinking more coffee in the afternoon", "Heavy late-night workouts"],
+     "answer": "Keeping a consistent wake-up time",
+     "explanation": "Consistent wake-up anchors the circadian rhythm."},
+]
+
+
+def index_path(path):
+    return os.path.splitext(path)[0] + ".idx"
+
+
+def group_key(kind, country=""):
+    return f"{kind}|{normalize_place(country)}"
+
+
+def clean_item(kind, raw, country=""):
+    """A validated bank item, or None if `raw` doesn't have the shape `kind` needs."""
+    if not isinstance(raw, dict):
+        return None
+    item = {"kind": kind, "country": normalize_place(country)}
+    if kind == "quiz":
+        question, options, answer = raw.get("question"), raw.get("options"), raw.get("answer")
+        if not (isinstance(question, str) and question.strip() and isinstance(options, list)
+                and 2 <= len(options) <= 6 and all(isinstance(o, str) and o.strip() for o in options)
+                and answer in options and len(set(options)) == len(options)):
+            return None
+        item.update(question=question.strip(), options=[o.strip() for o in options], answer=answer.strip(),
+                    explanation=str(raw.get("explanation") or "").strip())
+        identity = item["question"]
+    else:
+        text = raw.get("text")
+        if not isinstance(text, str) or not text.strip() or len(text) > 300:
+            return None
+        item["text"] = text.strip()
+        identity = item["text"]
+    item["id"] = hashlib.sha1(f"{kind}|{normalize_place(identity)}".encode("utf-8")).hexdigest()[:12]
+    return item
+
+
+def parse_batch(kind, text, country=""):
+    """(items, rejected line count) from a JSON-lines model reply; fences and chatter are skipped."""
+    items, rejected = [], 0
+    for line in (text or "").splitlines():
+        line = line.strip().rstrip(",")
+        if not line.startswith("{"):
+            continue
+        try:
+            item = clean_item(kind, json.loads(line), country)
+        except json.JSONDecodeError:
+            item = None
+        if item is None:
+            rejected += 1
+        else:
+            items.append(item)
+    return items, rejected
+
+
+def read_items(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_bank(items, path=DEFAULT_CONTENT_PATH):
+    """Write items (deduplicated by id) grouped for lookup; both files are replaced atomically."""
+    unique = {}
+    for item in items:
+        unique.setdefault(item["id"], item)
+    ordered = sorted(unique.values(), key=lambda item: (item["kind"], item["country"], item["id"]))
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    groups, offsets = {}, []
+    with open(path + ".tmp", "wb") as out:
+        for item in ordered:
+            key = group_key(item["kind"], item["country"])
+            start, count = groups.get(key, (len(offsets), 0))
+            groups[key] = (start, count + 1)
+            offsets.append(out.tell())
+            out.write(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n")
+        data_bytes = out.tell()
+    header = json.dumps({"version": 1, "groups": groups, "items": len(offsets), "data_bytes": data_bytes}).encode()
+    header += b" " * (-(len(header) + _LENGTH.size) % 8)  # offsets start 8-byte aligned
+    with open(index_path(path) + ".tmp", "wb") as out:
+        out.write(_LENGTH.pack(len(header)) + header + struct.pack(f"<{len(offsets)}Q", *offsets))
+    os.replace(path + ".tmp", path)
+    os.replace(index_path(path) + ".tmp", index_path(path))
+    return {key: count for key, (_, count) in groups.items()}
+
+
+def _stride(n, seed):
+    # Any step coprime to n visits every item once per n days; the seed picks which one.
+    if n <= 1:
+        return 0
+    step = 1 + seed // n % (n - 1)
+    while math.gcd(step, n) != 1:
+        step += 1
+    return step
+
+
+class ContentBank:
+    def __init__(self, path=DEFAULT_CONTENT_PATH):
+        self.path = path
+        self._data = None
+        self._index = None
+        self._groups = {}
+        self._base = 0
+        self._seed = None
+        if os.path.exists(path) and os.path.exists(index_path(path)):
+            self._open()
+        if self._data is None:
+            self._seed = {}
+            for raw in SEED_ITEMS:
+                item = clean_item(raw["kind"], raw)
+                self._seed.setdefault(group_key(item["kind"], item["country"]), []).append(item)
+            self._groups = {key: (0, len(items)) for key, items in self._seed.items()}
+
+    def _open(self):
+        with open(index_path(self.path), "rb") as f:
+            index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (header_length,) = _LENGTH.unpack_from(index, 0)
+        header = json.loads(index[_LENGTH.size:_LENGTH.size + header_length])
+        if header.get("data_bytes") != os.path.getsize(self.path):
+            index.close()  # the data file was replaced under an older index; serve the seed content
+            return
+        with open(self.path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if header["items"] else b""
+        self._index = index
+        self._base = _LENGTH.size + header_length
+        self._groups = {key: tuple(span) for key, span in header["groups"].items()}
+
+    @property
+    def from_seed(self):
+        return self._seed is not None
+
+    def count(self, kind, country=""):
+        return self._groups.get(group_key(kind, country), (0, 0))[1]
+
+    def group(self, kind, country=""):
+        """The group serving `country`: its own items if it has any, else the global ones."""
+        key = group_key(kind, country)
+        return key if key in self._groups else group_key(kind)
+
+    def item(self, key, position):
+        start, count = self._groups[key]
+        if self._seed is not None:
+            return self._seed[key][position % count]
+        (offset,) = _LENGTH.unpack_from(self._index, self._base + 8 * (start + position % count))
+        end = self._data.find(b"\n", offset)
+        return json.loads(self._data[offset:end])
+
+    def daily(self, kind, user_id="", country="", day=None):
+        """Today's item of `kind` for this user, or None if the bank has none."""
+        key = self.group(kind, country)
+        if key not in self._groups:
+            return None
+        count = self._groups[key][1]
+        day = datetime.date.today().toordinal() if day is None else day
+        seed = int.from_bytes(hashlib.sha256(f"{user_id}|{key}".encode("utf-8")).digest()[:8], "big")
+        return self.item(key, seed % count + day * _stride(count, seed))
+
+    def stats(self):
+        return {"from_seed": self.from_seed, "groups": {key: count for key, (_, count) in self._groups.items()}}
+
+
+# --- Offline bulk generation ---
+def batch_prompts(kind, total, country="", per_call=40):
+    calls = math.ceil(total / per_call)
+    return [get_content_batch_prompt(kind, per_call, country or None, TOPICS[i % len(TOPICS)], i // len(TOPICS) + 1)
+            for i in range(calls)]
+
+
+def generate_items(generate, plan, concurrency=8, progress=True):
+    """Run every (kind, country, prompt) in `plan` through generate(prompt); returns (items, stats)."""
+    items, stats = [], {"calls": 0, "failed_calls": 0, "rejected_lines": 0}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(generate, prompt): (kind, country) for kind, country, prompt in plan}
+        for future in as_completed(futures):
+            kind, country = futures[future]
+            stats["calls"] += 1
+            try:
+                batch, rejected = parse_batch(kind, future.result(), country)
+            except Exception as e:
+                stats["failed_calls"] += 1
+                print(f"\n{kind}/{country or 'global'}: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            items.extend(batch)
+            stats["rejected_lines"] += rejected
+            if progress:
+                print(f"\r{stats['calls']}/{len(plan)} calls, {len(items)} items", end="", file=sys.stderr, flush=True)
+    if progress and plan:
+        print(file=sys.stderr)
+    return items, stats
+
+
+def main(argv=None):
+    from llm import client_from_env
+    from response_cache import DEFAULT_CACHE_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--countries", default="", help="comma-separated countries to localize for (global is always built)")
+    parser.add_argument("--tips", type=int, default=500, help="tips per country")
+    parser.add_argument("--facts", type=int, default=300, help="facts per country")
+    parser.add_argument("--quizzes", type=int, default=150, help="quiz questions per country")
+    parser.add_argument("--per-call", type=int, default=40, help="items requested per model call")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fresh", action="store_true", help="start over instead of adding to the existing bank")
+    parser.add_argument("--path", default=os.getenv("GLOBALWELL_CONTENT_PATH", DEFAULT_CONTENT_PATH))
+    parser.add_argument("--cache-path", default=os.getenv("GLOBALWELL_CACHE_PATH", DEFAULT_CACHE_PATH))
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    client = client_from_env(args.cache_path)
+    countries = [""] + [c.strip() for c in args.countries.split(",") if c.strip()]
+    totals = {"tip": args.tips, "fact": args.facts, "quiz": args.quizzes}
+    plan = [(kind, country, prompt) for country in countries for kind in CONTENT_KINDS
+            for prompt in batch_prompts(kind, totals[kind], country, args.per_call)]
+    items, stats = generate_items(partial(client.generate, feature="content_bank"), plan, args.concurrency)
+
+    existing = [] if args.fresh else read_items(args.path)
+    seed = [clean_item(raw["kind"], raw) for raw in SEED_ITEMS]
+    stats["groups"] = write_bank(seed + existing + items, args.path)
+    stats["items"] = sum(stats["groups"].values())
+    stats["llm"] = client.telemetry.summary()["total"]
+    print(json.dumps(stats))
+    return 1 if stats["failed_calls"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Hedged requests and per-feature deadlines for model calls.
+
+A slow Gemini response otherwise stalls the whole rerun that asked for it.
+`Hedger` runs each upstream call on a worker thread and:
+
+- LatencyTracker: keeps recent per-feature latencies of single attempts
+  (time to the full response for generate, to the first chunk for streams)
+- after the feature's adaptive delay (its p95 by default), fires one
+  duplicate request and keeps whichever answers first; the other one is
+  cancelled (a stream stops being read and is closed, a blocking call's
+  result is dropped)
+- HedgeBudget: hedges may be at most a fixed share of calls, so a slow
+  upstream gets a bounded amount of extra traffic rather than double
+- enforces a hard per-feature deadline and then raises DeadlineExceededError
+  carrying that feature's fallback message
+
+No hedging happens until a feature has `min_samples` latencies.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from resilience import DeadlineExceededError
+
+
+DEFAULT_DEADLINES = {"chat": 30.0, "wellness_plan": 60.0, "local_info": 30.0, "chat_summary": 20.0}
+FALLBACK_MESSAGES = {
+    "chat": "GlobalWell AI is taking too long to answer. Please ask again in a moment.",
+    "wellness_plan": "Your plan is taking longer than usual to generate. Please try again in a moment.",
+    "local_info": "Local insights are slow to load right now; your plan works without them.",
+}
+DEFAULT_FALLBACK = "The AI service took too long to respond. Please try again."
+
+
+def fallback_message(feature):
+    return FALLBACK_MESSAGES.get(feature, DEFAULT_FALLBACK)
+
+
+def parse_deadlines(spec):
+    """"chat=20,wellness_plan=40" -> {"chat": 20.0, "wellness_plan": 40.0}."""
+    deadlines = {}
+    for part in spec.split(","):
+        if "=" in part:
+            feature, seconds = part.split("=", 1)
+            deadlines[feature.strip()] = float(seconds)
+    return deadlines
+
+
+class LatencyTracker:
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, key, q):
+        """Latency at quantile q, or None while there are fewer than min_samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class HedgeBudget:
+    """Each call earns `ratio` of a hedge, up to `burst`; a hedge spends one."""
+
+    def __init__(self, ratio=0.1, burst=5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._credit = burst
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._credit = min(self.burst, self._credit + self.ratio)
+
+    def spend(self):
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            return True
+
+
+class _Racer:
+    def __init__(self, index, key):
+        self.index = index
+        self.key = key
+        self.cancelled = threading.Event()
+        self.started = time.monotonic()
+
+
+class Hedger:
+    def __init__(self, tracker=None, budget=None, quantile=0.95, min_delay=0.25, deadlines=None,
+                 default_deadline=60.0, max_workers=64):
+        self.tracker = tracker or LatencyTracker()
+        self.budget = budget or HedgeBudget()
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.deadlines = DEFAULT_DEADLINES if deadlines is None else deadlines
+        self.default_deadline = default_deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="globalwell-hedge")
+        self._stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "over_budget": 0, "deadline_exceeded": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["hedge_ratio"] = round(stats["hedges"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return stats
+
+    def deadline(self, feature):
+        return self.deadlines.get(feature, self.default_deadline)
+
+    def delay(self, key):
+        """Seconds to wait before hedging, or None when there isn't enough history yet."""
+        latency = self.tracker.quantile(key, self.quantile)
+        return None if latency is None else max(self.min_delay, latency)
+
+    def call(self, feature, fn, call=None):
+        """Hedged fn(timeout) -> text; `call` (an LLMCall) is told about hedges."""
+        chunks = self._race(feature, (feature, "generate"), lambda timeout: (fn(timeout),), call)
+        try:
+            return next(chunks, "")
+        finally:
+            chunks.close()
+
+    def stream(self, feature, fn, call=None):
+        """Hedged fn(timeout) -> iterator of chunks; the race is decided by the first chunk."""
+        return self._race(feature, (feature, "stream"), fn, call)
+
+    def _run(self, racer, fn, timeout, events):
+        first = True
+        chunks = None
+        try:
+            chunks = iter(fn(timeout))
+            for chunk in chunks:
+                if first:
+                    self.tracker.record(racer.key, time.monotonic() - racer.started)
+                    first = False
+                if racer.cancelled.is_set():
+                    break
+                events.put((racer, "chunk", chunk))
+            else:
+                events.put((racer, "done", None))
+        except Exception as e:
+            events.put((racer, "error", e))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def _launch(self, index, key, fn, deadline_at, events):
+        racer = _Racer(index, key)
+        self._executor.submit(self._run, racer, fn, max(0.0, deadline_at - racer.started), events)
+        return racer
+
+    def _race(self, feature, key, fn, call):
+        self._count("calls")
+        self.budget.earn()
+        deadline_at = time.monotonic() + self.deadline(feature)
+        events = queue.Queue()
+        racers = [self._launch(0, key, fn, deadline_at, events)]
+        delay = self.delay(key)
+        hedge_at = None if delay is None else racers[0].started + delay
+        winner = None
+        failed = 0
+        try:
+            while True:
+                now = time.monotonic()
+                if hedge_at is not None and winner is None and now >= hedge_at:
+                    hedge_at = None
+                    if self.budget.spend():
+                        self._count("hedges")
+                        if call is not None:
+                            call.hedges += 1
+                        racers.append(self._launch(1, key, fn, deadline_at, events))
+                    else:
+                        self._count("over_budget")
+                    continue
+                wake_at = deadline_at if hedge_at is None or winner is not None else min(deadline_at, hedge_at)
+                try:
+                    racer, kind, value = events.get(timeout=max(0.0, wake_at - now))
+                except queue.Empty:
+                    if time.monotonic() >= deadline_at:
+                        self._count("deadline_exceeded")
+                        raise DeadlineExceededError(fallback_message(feature))
+                    continue
+                if winner is not None and racer is not winner:
+                    continue  # a cancelled loser still draining
+                if kind == "error":
+                    failed += 1
+                    if winner is None and failed < len(racers):
+                        continue  # the other request may still answer
+                    raise value
+                if winner is None:
+                    winner = racer
+                    for other in racers:
+                        if other is not racer:
+                            other.cancelled.set()
+                    if racer.index:
+                        self._count("hedge_wins")
+                        if call is not None:
+                            call.hedge_won = True
+                if kind == "done":
+                    return
+                yield value
+        finally:
+            for racer in racers:
+                racer.cancelled.set()
+
+
+def hedger_from_env(env=None):
+    """None unless GLOBALWELL_HEDGING=1."""
+    env = os.environ if env is None else env
+    if env.get("GLOBALWELL_HEDGING", "").lower() not in ("1", "true", "yes"):
+        return None
+    deadlines = dict(DEFAULT_DEADLINES)
+    deadlines.update(parse_deadlines(env.get("GLOBALWELL_HEDGE_DEADLINES", "")))
+    return Hedger(
+        tracker=LatencyTracker(min_samples=int(env.get("GLOBALWELL_HEDGE_MIN_SAMPLES", "20"))),
+        budget=HedgeBudget(ratio=float(env.get("GLOBALWELL_HEDGE_BUDGET", "0.1"))),
+        quantile=float(env.get("GLOBALWELL_HEDGE_QUANTILE", "0.95")),
+        min_delay=float(env.get("GLOBALWELL_HEDGE_MIN_DELAY_SECONDS", "0.25")),
+        deadlines=deadlines,
+        default_deadline=float(env.get("GLOBALWELL_LLM_DEADLINE_SECONDS", "60")),
+    )
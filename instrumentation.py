@@ -0,0 +1,256 @@
+"""Opt-in rerun instrumentation.
+
+Enabled with GLOBALWELL_INSTRUMENT=1. Named regions of the script are timed
+into process-wide latency histograms and counters, payload sizes are recorded
+per element kind, and every rerun is emitted as one structured JSON log line.
+Reruns carry a scope: "app" for full script runs, or the fragment's name
+when only that fragment reran.
+`Metrics.render_prometheus()` backs the /metrics endpoint. A fraction of
+reruns (GLOBALWELL_PROFILE_SAMPLE_RATE) can additionally be run under cProfile,
+one at a time; a sampled rerun that finds the profiler busy just isn't profiled.
+
+When disabled every hook is a cheap no-op.
+"""
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+log = logging.getLogger("globalwell.metrics")
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th observation (Prometheus-style estimate)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return float("inf")
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+class Metrics:
+    def __init__(self, prefix="globalwell"):
+        self.prefix = prefix
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS_MS, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            counters = {f"{name}{_format_labels(labels)}": value
+                        for (name, labels), value in self._counters.items()}
+            histograms = {f"{name}{_format_labels(labels)}": {
+                "count": h.count, "sum": round(h.sum, 3),
+                "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                for (name, labels), h in self._histograms.items()}
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = _metric_name(f"{self.prefix}_{name}_total")
+                lines.append(f"{metric}{_format_labels(labels)} {value}")
+            for (name, labels), h in sorted(self._histograms.items()):
+                metric = _metric_name(f"{self.prefix}_{name}")
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+class RerunRecord:
+    def __init__(self, session_id, scope="app"):
+        self.session_id = session_id
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.regions = {}
+        self.payload_bytes = {}
+        self.profiler = None
+
+
+class Instrumentation:
+    def __init__(self, enabled=False, profile_sample_rate=0.0, profile_dir=None, metrics=None):
+        self.enabled = enabled
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_dir = profile_dir
+        self.metrics = metrics or Metrics()
+        self._local = threading.local()
+        # One profiled rerun at a time: on Python 3.12+ every cProfile shares one sys.monitoring slot.
+        self._profile_lock = threading.Lock()
+        self._profiled = None  # (record, thread) of the rerun holding the profiler
+
+    @property
+    def current(self):
+        return getattr(self._local, "record", None)
+
+    # --- reruns ---
+    def begin_rerun(self, session_id, scope="app"):
+        if not self.enabled:
+            return None
+        if self.current is not None:
+            self.end_rerun(status="interrupted")  # st.stop()/st.rerun() skipped the last end_rerun
+        record = self._local.record = RerunRecord(session_id, scope)
+        if self.profile_sample_rate and random.random() < self.profile_sample_rate:
+            self._start_profile(record)
+        return record
+
+    def end_rerun(self, status="ok"):
+        record = self.current
+        if record is None:
+            return None
+        self._local.record = None
+        total_ms = (time.perf_counter() - record.started) * 1000
+        self.metrics.observe("rerun_ms", total_ms, scope=record.scope)
+        self.metrics.inc("reruns", status=status, scope=record.scope)
+        entry = {
+            "event": "rerun", "session": record.session_id, "scope": record.scope, "status": status,
+            "total_ms": round(total_ms, 2),
+            "regions_ms": {k: round(v, 2) for k, v in record.regions.items()},
+            "payload_bytes": record.payload_bytes,
+        }
+        if record.profiler is not None:
+            self._stop_profile(record)
+            entry["profile"] = self._dump_profile(record)
+        log.info(json.dumps(entry))
+        return entry
+
+    def _start_profile(self, record):
+        """Profile this rerun unless another one already is; a skipped sample never fails the rerun."""
+        with self._profile_lock:
+            if self._profiled is not None:
+                owner, thread = self._profiled
+                if thread.is_alive():
+                    return
+                owner.profiler.disable()  # its script thread ended without end_rerun (st.stop())
+                self._profiled = None
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiling tool is active
+                return
+            record.profiler = profiler
+            self._profiled = (record, threading.current_thread())
+
+    def _stop_profile(self, record):
+        with self._profile_lock:
+            record.profiler.disable()
+            if self._profiled is not None and self._profiled[0] is record:
+                self._profiled = None
+
+    def _dump_profile(self, record):
+        directory = self.profile_dir or "profiles"
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"rerun-{int(time.time() * 1000)}-{record.session_id[:8]}.prof")
+        record.profiler.dump_stats(path)
+        return path
+
+    # --- hooks used throughout the app ---
+    @contextlib.contextmanager
+    def region(self, name):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.metrics.observe("region_ms", elapsed, region=name)
+            record = self.current
+            if record is not None:
+                record.regions[name] = record.regions.get(name, 0.0) + elapsed
+
+    def timed(self, name, fn):
+        """Wrap fn so each call is recorded as region `name` (works off the script thread too)."""
+        def wrapper(*args, **kwargs):
+            with self.region(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def payload(self, name, size):
+        if not self.enabled:
+            return
+        self.metrics.observe("payload_bytes", size, buckets=SIZE_BUCKETS, kind=name)
+        record = self.current
+        if record is not None:
+            record.payload_bytes[name] = record.payload_bytes.get(name, 0) + size
+
+    def count(self, name, value=1, **labels):
+        if self.enabled:
+            self.metrics.inc(name, value, **labels)
+
+
+def instrumentation_from_env(env=None):
+    env = os.environ if env is None else env
+    enabled = env.get("GLOBALWELL_INSTRUMENT", "").lower() in ("1", "true", "yes")
+    if enabled and not log.handlers and not logging.getLogger().handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+    return Instrumentation(
+        enabled=enabled,
+        profile_sample_rate=float(env.get("GLOBALWELL_PROFILE_SAMPLE_RATE", "0")),
+        profile_dir=env.get("GLOBALWELL_PROFILE_DIR"),
+    )
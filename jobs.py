@@ -0,0 +1,104 @@
+"""Per-session background jobs on a shared thread pool.
+
+Jobs run off the script thread and never touch Streamlit; the script collects
+finished results into session state on a later pass. Each job has a name (at
+most one live job per name) and a key describing its inputs. A job whose key
+no longer matches what the user is looking at can be cancelled.
+"""
+import threading
+from concurrent.futures import wait
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name, key, future, cancelled):
+        self.name = name
+        self.key = key
+        self.future = future
+        self.cancelled = cancelled
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def error(self):
+        if not self.future.done() or self.future.cancelled():
+            return None
+        return self.future.exception()
+
+    def result(self):
+        return self.future.result()
+
+
+class SessionJobs:
+    def __init__(self, executor):
+        self.executor = executor
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name, fn, *args, key=None):
+        """Run fn(cancelled_event, *args) in the background, replacing any job with a different key."""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is not None and job.key == key and not job.cancelled.is_set():
+                return job
+            if job is not None:
+                self._cancel(job)
+            cancelled = threading.Event()
+            job = Job(name, key, self.executor.submit(fn, cancelled, *args), cancelled)
+            self._jobs[name] = job
+            return job
+
+    def get(self, name):
+        return self._jobs.get(name)
+
+    def running(self, name, key=None):
+        job = self._jobs.get(name)
+        return job is not None and not job.done and (key is None or job.key == key)
+
+    def wait(self, name, timeout=None):
+        job = self._jobs.get(name)
+        if job is not None:
+            wait([job.future], timeout=timeout)
+        return job
+
+    def cancel(self, name):
+        with self._lock:
+            job = self._jobs.pop(name, None)
+            if job is not None:
+                self._cancel(job)
+
+    def cancel_all(self):
+        with self._lock:
+            for job in self._jobs.values():
+                self._cancel(job)
+            self._jobs.clear()
+
+    def _cancel(self, job):
+        job.cancelled.set()
+        job.future.cancel()
+
+    def collect(self, name):
+        """Pop and return the job if it has finished (successfully or not), else None."""
+        with self._lock:
+            job = self._jobs.get(name)
+            if job is None or not job.done:
+                return None
+            del self._jobs[name]
+            if job.future.cancelled() or isinstance(job.error, JobCancelled):
+                return None
+            return job
+
+
+def generate_cancellable(cancelled, client, prompt, feature="other"):
+    # Streaming lets a cancelled job stop consuming the response between chunks.
+    parts = []
+    for chunk in client.stream(prompt, feature=feature):
+        if cancelled.is_set():
+            raise JobCancelled(prompt[:40])
+        parts.append(chunk)
+    return "".join(parts)
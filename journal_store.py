@@ -0,0 +1,183 @@
+"""Durable gratitude journal storage.
+
+Entries live in SQLite (WAL mode) keyed by (user_id, entry_date), which is
+also the index used for date-range queries and keyset pagination. Writes are
+queued and applied by one background thread in batches. `save()` returns a
+PendingSave that is set once the batch commits (or finally fails), and a read
+waits a bounded time for that user's latest save, so a user sees their own
+save without any read waiting on the whole queue. A batch that fails (e.g. the
+database is locked) is retried with backoff, then reported and logged, and
+the writer moves on to the next one.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_JOURNAL_PATH = os.path.join(".globalwell_data", "journal.sqlite3")
+
+log = logging.getLogger("globalwell.journal")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS gratitude (
+    user_id    TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    items      TEXT NOT NULL,
+    updated    REAL NOT NULL,
+    PRIMARY KEY (user_id, entry_date)
+) WITHOUT ROWID
+"""
+
+
+def _connect(path):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class PendingSave:
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+    def wait(self, timeout=None):
+        """True once committed, False if still queued after `timeout`; raises the error if the write failed."""
+        if not self.done.wait(timeout):
+            return False
+        if self.error is not None:
+            raise self.error
+        return True
+
+
+class JournalStore:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, batch_size=100, retries=3, retry_delay=0.5, read_wait=2.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.read_wait = read_wait
+        self._reader = _connect(path)
+        self._reader.execute(_SCHEMA)
+        self._reader.commit()
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._pending = {}  # user_id -> PendingSave of their latest queued save
+        self._last = None
+        self._pending_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="globalwell-journal", daemon=True)
+        self._writer.start()
+
+    # --- writes ---
+    def save(self, user_id, entry_date, items):
+        pending = PendingSave()
+        with self._pending_lock:
+            self._pending[user_id] = self._last = pending
+        self._queue.put(((user_id, str(entry_date), json.dumps(list(items), ensure_ascii=False), time.time()), pending))
+        return pending
+
+    def flush(self, timeout=None):
+        """Wait for everything queued so far; False if it is still pending after `timeout`."""
+        pending = self._last
+        return pending is None or pending.done.wait(timeout)
+
+    def _commit(self, db, rows):
+        for attempt in range(self.retries):
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO gratitude (user_id, entry_date, items, updated) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(user_id, entry_date) DO UPDATE SET items = excluded.items, updated = excluded.updated",
+                        rows,
+                    )
+                return None
+            except sqlite3.Error as e:
+                error = e
+                if attempt + 1 < self.retries:
+                    time.sleep(self.retry_delay * 2 ** attempt)
+        return error
+
+    def _write_loop(self):
+        db = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            # Whatever piled up while the last batch was committing goes in one transaction.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                error = self._commit(db, [row for row, _ in batch])
+            except Exception as e:  # never let one bad batch stop the writer
+                error = e
+            if error is not None:
+                log.error("Dropped %d journal save(s) after %d attempts: %s", len(batch), self.retries, error)
+            with self._pending_lock:
+                for row, pending in batch:
+                    pending.error = error
+                    pending.done.set()
+                    user_id = row[0]
+                    if self._pending.get(user_id) is pending:
+                        del self._pending[user_id]
+
+    # --- reads ---
+    def _query(self, user_id, sql, params):
+        # Read-your-writes for this user only, and never longer than read_wait.
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            pending.done.wait(self.read_wait)
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def page(self, user_id, before=None, after=None, since=None, limit=10):
+        """Entries newest first. `before`/`after` are exclusive date cursors; `since` is an inclusive lower bound."""
+        clauses, params = ["user_id = ?"], [user_id]
+        if before is not None:
+            clauses.append("entry_date < ?")
+            params.append(str(before))
+        if after is not None:
+            clauses.append("entry_date > ?")
+            params.append(str(after))
+        if since is not None:
+            clauses.append("entry_date >= ?")
+            params.append(str(since))
+        order = "ASC" if after is not None and before is None else "DESC"
+        rows = self._query(
+            user_id,
+            f"SELECT entry_date, items FROM gratitude WHERE {' AND '.join(clauses)} "
+            f"ORDER BY entry_date {order} LIMIT ?",
+            params + [limit],
+        )
+        entries = [(d, json.loads(items)) for d, items in rows]
+        return entries if order == "DESC" else entries[::-1]
+
+    def range(self, user_id, start, end):
+        """Entries with start <= date <= end, newest first."""
+        rows = self._query(
+            user_id,
+            "SELECT entry_date, items FROM gratitude WHERE user_id = ? AND entry_date BETWEEN ? AND ? "
+            "ORDER BY entry_date DESC",
+            (user_id, str(start), str(end)),
+        )
+        return [(d, json.loads(items)) for d, items in rows]
+
+    def get(self, user_id, entry_date):
+        rows = self._query(user_id, "SELECT items FROM gratitude WHERE user_id = ? AND entry_date = ?",
+                           (user_id, str(entry_date)))
+        return json.loads(rows[0][0]) if rows else None
+
+    def count(self, user_id, since=None):
+        if since is None:
+            rows = self._query(user_id, "SELECT COUNT(*) FROM gratitude WHERE user_id = ?", (user_id,))
+        else:
+            rows = self._query(user_id, "SELECT COUNT(*) FROM gratitude WHERE user_id = ? AND entry_date >= ?",
+                               (user_id, str(since)))
+        return rows[0][0]
@@ -0,0 +1,510 @@
+"""LLM backends and the client the app talks to.
+
+`generate_ai_response` only ever sees an `LLMClient`; which backend sits behind
+it is chosen by `backend_from_env()`:
+
+- ``gemini``   (default) the live Gemini API, needs GEMINI_API_KEY
+- ``cassette`` replays prompt->response pairs recorded on disk, optionally
+               recording misses through Gemini
+- ``fake``     deterministic offline responses with configurable latency and
+               failure injection, for profiling and benchmarks
+
+Backends take an optional `usage` dict and fill in ``prompt_tokens`` and
+``output_tokens`` when they know them; the client's telemetry (see
+llm_telemetry.py) falls back to estimates otherwise. Given a `Hedger`
+(hedging.py), the client races a duplicate request against slow calls and
+holds each feature to a deadline.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from chat_context import estimate_tokens
+from response_cache import make_cache_key, normalize_prompt
+
+
+DEFAULT_MODEL_NAME = "gemini-1.5-flash"
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "llm_cassette.jsonl")
+
+
+class LLMError(Exception):
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMConfigError(LLMError):
+    pass
+
+
+class CassetteMiss(LLMError):
+    pass
+
+
+# --- Backends ---
+class LLMBackend:
+    model_name = "unknown"
+    generation_config = None
+
+    def generate(self, prompt, timeout=None, usage=None):
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout=None, usage=None):
+        yield self.generate(prompt, timeout=timeout, usage=usage)
+
+
+def _record_usage(usage, metadata):
+    if usage is not None and metadata is not None:
+        usage["prompt_tokens"] = getattr(metadata, "prompt_token_count", 0) or 0
+        usage["output_tokens"] = getattr(metadata, "candidates_token_count", 0) or 0
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, api_key, model_name=DEFAULT_MODEL_NAME, generation_config=None):
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise LLMConfigError("google-generativeai is not installed. Run `pip install -r requirements.txt`.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self._model = genai.GenerativeModel(model_name, generation_config=generation_config)
+
+    def _request_options(self, timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def generate(self, prompt, timeout=None, usage=None):
+        response = self._model.generate_content(prompt, request_options=self._request_options(timeout))
+        _record_usage(usage, getattr(response, "usage_metadata", None))
+        return response.text
+
+    def stream(self, prompt, timeout=None, usage=None):
+        for chunk in self._model.generate_content(prompt, stream=True,
+                                                  request_options=self._request_options(timeout)):
+            # Every chunk carries the running counts; the last one has the totals.
+            _record_usage(usage, getattr(chunk, "usage_metadata", None))
+            text = chunk.text
+            if text:
+                yield text
+
+
+def prompt_fingerprint(prompt):
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class CassetteBackend(LLMBackend):
+    """Record/replay backend backed by an append-only JSONL file.
+
+    mode ``replay`` only serves recorded prompts (a miss raises CassetteMiss),
+    ``record`` always calls the inner backend and overwrites, ``auto`` replays
+    hits and records misses.
+    """
+
+    def __init__(self, path=DEFAULT_CASSETTE_PATH, inner=None, mode="auto"):
+        if mode not in ("replay", "record", "auto"):
+            raise LLMConfigError(f"Unknown cassette mode: {mode}")
+        if mode != "replay" and inner is None:
+            raise LLMConfigError(f"Cassette mode '{mode}' needs a live backend to record from.")
+        self.path = path
+        self.inner = inner
+        self.mode = mode
+        self.model_name = f"cassette:{inner.model_name}" if inner else "cassette"
+        self._entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["response"]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, prompt):
+        key = prompt_fingerprint(prompt)
+        if self.mode != "record" and key in self._entries:
+            return key, self._entries[key]
+        if self.mode == "replay":
+            raise CassetteMiss(f"No recorded response for prompt {key[:12]} in {self.path}")
+        return key, None
+
+    def _record(self, key, prompt, response):
+        entry = {"key": key, "model": self.inner.model_name, "prompt": prompt, "response": response}
+        with self._lock:
+            self._entries[key] = response
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def generate(self, prompt, timeout=None, usage=None):
+        key, response = self._lookup(prompt)
+        if response is not None:
+            return response
+        response = self.inner.generate(prompt, timeout=timeout, usage=usage)
+        self._record(key, prompt, response)
+        return response
+
+    def stream(self, prompt, timeout=None, usage=None):
+        key, response = self._lookup(prompt)
+        if response is not None:
+            yield response
+            return
+        parts = []
+        for chunk in self.inner.stream(prompt, timeout=timeout, usage=usage):
+            parts.append(chunk)
+            yield chunk
+        self._record(key, prompt, "".join(parts))
+
+
+def fake_response(prompt):
+    # Shaped like the real answers (markdown, `## ` sections for plans) so the
+    # rest of the pipeline exercises the same parsing and rendering paths.
+    tag = prompt_fingerprint(prompt)[:8]
+    batch = re.search(r'Reply with exactly (\d+) lines of JSON', prompt)
+    if batch:
+        lines = []
+        for i in range(int(batch.group(1))):
+            if '"question"' in prompt:
+                options = [f"Option {c} ({tag}-{i})" for c in "ABCD"]
+                lines.append(json.dumps({"question": f"Offline quiz question {tag}-{i}?", "options": options,
+                                         "answer": options[1], "explanation": "Offline sample explanation."}))
+            else:
+                lines.append(json.dumps({"text": f"Offline item {tag}-{i}: one small, low-cost step at a time."}))
+        return "\n".join(lines)
+    if "personalize this wellness plan" in prompt.lower():
+        return (f"## Nutrition\n- Personal tip ({tag}): swap one snack a day for fruit.\n"
+                "## Sleep\n- Personal tip: keep the same wake-up time on weekends.")
+    if "wellness plan" in prompt.lower():
+        sections = ["Nutrition", "Physical Activity", "Mental Well-being", "Sleep", "Alignment with SDG 3"]
+        body = [f"Here is your offline sample plan ({tag})."]
+        for i, title in enumerate(sections, 1):
+            body.append(f"## {title}\n"
+                        f"- Step {i}.1: a simple, low-cost habit for {title.lower()}.\n"
+                        f"- Step {i}.2: track it for a week and adjust.")
+        return "\n".join(body)
+    if "myth" in prompt.lower():
+        return (f"**Hyper-Local Produce Guide ({tag})**\n- Spinach\n- Guava\n- Carrots\n\n"
+                "**Myth:** Superfood powders are necessary. **Fact:** Local greens do the job.")
+    return f"This is an offline answer ({tag}). Keep going with the plan one small step at a time."
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic offline backend.
+
+    latency is the delay before the first token (plus uniform +/- jitter),
+    with probability tail_rate a call is a straggler and waits tail_latency
+    more (the long tail that hedging is for), chunk_delay is the delay
+    between streamed chunks and failure_rate the chance a call raises a
+    retryable LLMError.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, chunk_delay=0.0, failure_rate=0.0, seed=None,
+                 responder=fake_response, model_name="fake", tail_rate=0.0, tail_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.chunk_delay = chunk_delay
+        self.failure_rate = failure_rate
+        self.responder = responder
+        self.model_name = model_name
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _start_call(self, timeout):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            if self._random.random() < self.tail_rate:
+                delay += self.tail_latency
+            fail = self._random.random() < self.failure_rate
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise LLMError("FakeBackend call timed out", retryable=True)
+        time.sleep(delay)
+        if fail:
+            raise LLMError("Injected failure from FakeBackend", retryable=True)
+
+    def _report(self, usage, prompt, response):
+        if usage is not None:
+            usage["prompt_tokens"] = estimate_tokens(prompt)
+            usage["output_tokens"] = estimate_tokens(response)
+
+    def generate(self, prompt, timeout=None, usage=None):
+        self._start_call(timeout)
+        response = self.responder(prompt)
+        self._report(usage, prompt, response)
+        return response
+
+    def stream(self, prompt, timeout=None, usage=None):
+        self._start_call(timeout)
+        response = self.responder(prompt)
+        for i, chunk in enumerate(re.findall(r'\S+\s*', response)):
+            if i and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield chunk
+        self._report(usage, prompt, response)
+
+
+def backend_from_env(env=None):
+    env = os.environ if env is None else env
+    kind = env.get("GLOBALWELL_LLM_BACKEND", "gemini").lower()
+    model_name = env.get("GLOBALWELL_MODEL", DEFAULT_MODEL_NAME)
+    api_key = env.get("GEMINI_API_KEY")
+    if kind == "gemini":
+        if not api_key:
+            raise LLMConfigError("Gemini API key not found. Please create a .env file with "
+                                 "GEMINI_API_KEY='YOUR_API_KEY' (or set GLOBALWELL_LLM_BACKEND=fake to run offline).")
+        return GeminiBackend(api_key, model_name)
+    if kind == "cassette":
+        inner = GeminiBackend(api_key, model_name) if api_key else None
+        mode = env.get("GLOBALWELL_CASSETTE_MODE", "auto" if inner else "replay")
+        return CassetteBackend(env.get("GLOBALWELL_CASSETTE_PATH", DEFAULT_CASSETTE_PATH), inner, mode)
+    if kind == "fake":
+        return FakeBackend(
+            latency=float(env.get("GLOBALWELL_FAKE_LATENCY", "0")),
+            jitter=float(env.get("GLOBALWELL_FAKE_JITTER", "0")),
+            chunk_delay=float(env.get("GLOBALWELL_FAKE_CHUNK_DELAY", "0")),
+            failure_rate=float(env.get("GLOBALWELL_FAKE_FAILURE_RATE", "0")),
+            seed=env.get("GLOBALWELL_FAKE_SEED"),
+            tail_rate=float(env.get("GLOBALWELL_FAKE_TAIL_RATE", "0")),
+            tail_latency=float(env.get("GLOBALWELL_FAKE_TAIL_LATENCY", "0")),
+        )
+    raise LLMConfigError(f"Unknown GLOBALWELL_LLM_BACKEND: {kind}")
+
+
+# --- Request coalescing ---
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one upstream call.
+
+    The first caller (the leader) does the work; callers arriving while it is
+    in flight wait and receive the same result or exception.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    def begin(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self._stats["leaders"] += 1
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result, flight.error = result, error
+        flight.done.set()
+
+    def wait(self, flight):
+        flight.done.wait()
+        if isinstance(flight.error, GeneratorExit):
+            raise LLMError("The shared request was abandoned before it finished.", retryable=True)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def do(self, key, fn):
+        flight, leader = self.begin(key)
+        if not leader:
+            return self.wait(flight)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, flight, error=e)
+            raise
+        self.finish(key, flight, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        total = stats["leaders"] + stats["coalesced"]
+        stats["coalesced_ratio"] = stats["coalesced"] / total if total else 0.0
+        return stats
+
+
+# --- Client ---
+class _UntrackedCall:
+    """Stands in for an llm_telemetry.LLMCall when the client has no telemetry."""
+
+    def __init__(self, feature):
+        self.feature = feature
+        self.outcome = "upstream"
+        self.attempts = 0
+        self.hedges = 0
+        self.hedge_won = False
+        self.usage = None
+
+    def first_token(self):
+        pass
+
+    def finish(self, text=None, error=None, outcome=None):
+        pass
+
+
+class LLMClient:
+    def __init__(self, backend, cache=None, singleflight=None, resilience=None, telemetry=None, hedging=None):
+        self.backend = backend
+        self.cache = cache
+        self.singleflight = singleflight
+        self.resilience = resilience
+        self.telemetry = telemetry
+        self.hedging = hedging
+
+    def _cache_key(self, prompt):
+        return make_cache_key(self.backend.model_name, prompt, self.backend.generation_config)
+
+    def _cached(self, key):
+        return self.cache.get(key) if self.cache is not None else None
+
+    def _start(self, feature, prompt):
+        if self.telemetry is None:
+            return _UntrackedCall(feature)
+        return self.telemetry.start(feature, self.backend.model_name, prompt)
+
+    def generate(self, prompt, feature="other"):
+        """Full response text; `feature` tags the call in telemetry."""
+        call = self._start(feature, prompt)
+        try:
+            text = self._serve(prompt, call)
+        except Exception as e:
+            call.finish(error=e)
+            raise
+        call.finish(text)
+        return text
+
+    def _serve(self, prompt, call):
+        key = self._cache_key(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            call.outcome = "cache"
+            return cached
+        if self.singleflight is None:
+            return self._generate(key, prompt, call)
+        call.outcome = "coalesced"  # the leader's _generate switches it to upstream
+        return self.singleflight.do(key, lambda: self._generate(key, prompt, call))
+
+    def _generate(self, key, prompt, call):
+        call.outcome = "upstream"
+
+        def attempt(timeout=None):
+            call.attempts += 1
+            return self.backend.generate(prompt, timeout=timeout, usage=call.usage)
+
+        def protected(timeout=None):
+            return attempt(timeout) if self.resilience is None else self.resilience.call(attempt, deadline=timeout)
+
+        text = protected() if self.hedging is None else self.hedging.call(call.feature, protected, call)
+        if self.cache is not None:
+            self.cache.set(key, text)
+        return text
+
+    def stream(self, prompt, feature="other"):
+        """Response chunks as they arrive; `feature` tags the call in telemetry."""
+        call = self._start(feature, prompt)
+        parts = []
+        try:
+            for chunk in self._serve_stream(prompt, call):
+                call.first_token()
+                parts.append(chunk)
+                yield chunk
+        except GeneratorExit:
+            call.finish("".join(parts), outcome="abandoned" if call.outcome == "upstream" else None)
+            raise
+        except Exception as e:
+            call.finish(error=e)
+            raise
+        call.finish("".join(parts))
+
+    def _serve_stream(self, prompt, call):
+        key = self._cache_key(prompt)
+        cached = self._cached(key)
+        if cached is not None:
+            call.outcome = "cache"
+            yield cached
+            return
+        if self.singleflight is None:
+            yield from self._stream(key, prompt, call)
+            return
+        # Followers of an in-flight identical request get its full text in one chunk.
+        flight, leader = self.singleflight.begin(key)
+        if not leader:
+            call.outcome = "coalesced"
+            yield self.singleflight.wait(flight)
+            return
+        parts = []
+        try:
+            for chunk in self._stream(key, prompt, call):
+                parts.append(chunk)
+                yield chunk
+        except BaseException as e:
+            self.singleflight.finish(key, flight, error=e)
+            raise
+        self.singleflight.finish(key, flight, result="".join(parts))
+
+    def _stream(self, key, prompt, call):
+        call.outcome = "upstream"
+
+        def attempt(timeout=None):
+            call.attempts += 1
+            return self.backend.stream(prompt, timeout=timeout, usage=call.usage)
+
+        def protected(timeout=None):
+            return attempt(timeout) if self.resilience is None else self.resilience.stream(attempt, deadline=timeout)
+
+        chunks = protected() if self.hedging is None else self.hedging.stream(call.feature, protected, call)
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        if self.cache is not None:
+            self.cache.set(key, "".join(parts))
+
+    def stats(self):
+        stats = {}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        if self.singleflight is not None:
+            stats["singleflight"] = self.singleflight.stats()
+        if self.resilience is not None:
+            stats["resilience"] = self.resilience.stats()
+        if self.telemetry is not None:
+            stats["telemetry"] = self.telemetry.summary()
+        if self.hedging is not None:
+            stats["hedging"] = self.hedging.stats()
+        return stats
+
+
+def client_from_env(cache_path, env=None):
+    """The client the batch CLIs share: env-selected backend, response cache, coalescing, retries, telemetry."""
+    # Both modules import this one, so they can only be imported once it has loaded.
+    from llm_telemetry import telemetry_from_env
+    from resilience import resilience_from_env
+    from response_cache import ResponseCache
+
+    return LLMClient(backend_from_env(env), cache=ResponseCache(cache_path), singleflight=SingleFlight(),
+                     resilience=resilience_from_env(env), telemetry=telemetry_from_env(env=env))
@@ -0,0 +1,246 @@
+"""Per-feature accounting for model calls.
+
+Every call made through `LLMClient` is tagged with the feature that asked for
+it ("wellness_plan", "local_info", "chat", ...) and becomes one `LLMCall`:
+prompt and response tokens (as reported by the backend, estimated otherwise),
+time to first token, total latency, attempts, hedged duplicates (see
+hedging.py), and how it was served:
+
+- ``upstream``  the model was called
+- ``cache``     served from the response cache
+- ``coalesced`` joined an identical call already in flight
+- ``error`` / ``abandoned``  failed, or the consumer stopped reading a stream
+
+`LLMTelemetry` keeps cumulative per-feature counters (calls by outcome,
+retries, hedges, billed tokens, cost, and the cost that cache hits and
+coalescing avoided) plus a rolling window of recent calls for latency percentiles.
+`summary()` is the in-process query; when given the instrumentation
+`Metrics` the same numbers are exported on /metrics, and with
+GLOBALWELL_LLM_LOG=1 every call is also logged as one JSON line.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from chat_context import estimate_tokens
+from llm import DEFAULT_MODEL_NAME
+
+
+# USD per million (prompt, output) tokens; the longest matching model-name prefix wins.
+PRICES_PER_MILLION = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+}
+OUTCOMES = ("upstream", "cache", "coalesced", "error", "abandoned")
+
+log = logging.getLogger("globalwell.llm")
+
+
+def model_price(model_name, prices=PRICES_PER_MILLION):
+    matches = [name for name in prices if model_name.startswith(name)]
+    return prices[max(matches, key=len)] if matches else (0.0, 0.0)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+
+    def at(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+    return {"count": len(values), "p50": at(0.5), "p95": at(0.95), "p99": at(0.99), "max": round(values[-1], 2)}
+
+
+class LLMCall:
+    """One call as seen by the client. Backends fill `usage` with the provider's token counts."""
+
+    def __init__(self, telemetry, feature, model, prompt):
+        self.telemetry = telemetry
+        self.feature = feature
+        self.model = model
+        self.prompt = prompt
+        self.started = time.perf_counter()
+        self.ttft_ms = None
+        self.latency_ms = None
+        self.outcome = "upstream"
+        self.attempts = 0
+        self.hedges = 0
+        self.hedge_won = False
+        self.usage = {}
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.error = None
+
+    def first_token(self):
+        if self.ttft_ms is None:
+            self.ttft_ms = (time.perf_counter() - self.started) * 1000
+
+    def finish(self, text=None, error=None, outcome=None):
+        if self.latency_ms is not None:
+            return
+        self.latency_ms = (time.perf_counter() - self.started) * 1000
+        if self.ttft_ms is None and text is not None:
+            self.ttft_ms = self.latency_ms
+        if error is not None:
+            self.outcome, self.error = "error", f"{type(error).__name__}: {error}"
+        elif outcome is not None:
+            self.outcome = outcome
+        # Billed tokens: what the provider reported, else an estimate. Cache hits and followers bill nothing.
+        self.prompt_tokens = self.usage.get("prompt_tokens") or estimate_tokens(self.prompt)
+        self.output_tokens = self.usage.get("output_tokens") or estimate_tokens(text or "")
+        if self.telemetry is not None:
+            self.telemetry.record(self)
+
+    @property
+    def retries(self):
+        return max(0, self.attempts - 1 - self.hedges)
+
+    @property
+    def billed_prompt_tokens(self):
+        # A cancelled hedge is still charged for its prompt; its few output tokens are not counted.
+        return self.prompt_tokens * (1 + self.hedges)
+
+    @property
+    def billed(self):
+        return self.outcome in ("upstream", "abandoned") or (self.outcome == "error" and bool(self.usage))
+
+    def as_dict(self):
+        return {
+            "event": "llm_call", "feature": self.feature, "model": self.model, "outcome": self.outcome,
+            "attempts": self.attempts, "hedges": self.hedges, "hedge_won": self.hedge_won,
+            "prompt_tokens": self.prompt_tokens, "output_tokens": self.output_tokens,
+            "tokens_reported": bool(self.usage),
+            "ttft_ms": None if self.ttft_ms is None else round(self.ttft_ms, 2),
+            "latency_ms": round(self.latency_ms, 2), "error": self.error,
+        }
+
+
+def _empty_counters():
+    return {"calls": 0, "outcomes": dict.fromkeys(OUTCOMES, 0), "retries": 0, "hedges": 0, "hedge_wins": 0,
+            "prompt_tokens": 0, "output_tokens": 0, "saved_tokens": 0, "cost_usd": 0.0, "saved_usd": 0.0}
+
+
+class LLMTelemetry:
+    def __init__(self, metrics=None, log_calls=False, window_seconds=900, max_window=5000, prices=None):
+        self.metrics = metrics
+        self.log_calls = log_calls
+        self.window_seconds = window_seconds
+        self.prices = PRICES_PER_MILLION if prices is None else prices
+        self._features = {}
+        self._window = deque(maxlen=max_window)  # (time, feature, outcome, latency_ms, ttft_ms)
+        self._lock = threading.Lock()
+
+    def start(self, feature, model, prompt):
+        return LLMCall(self, feature, model, prompt)
+
+    def cost(self, model, prompt_tokens, output_tokens):
+        prompt_price, output_price = model_price(model, self.prices)
+        return (prompt_tokens * prompt_price + output_tokens * output_price) / 1e6
+
+    def record(self, call):
+        cost = self.cost(call.model, call.billed_prompt_tokens, call.output_tokens)
+        with self._lock:
+            counters = self._features.get(call.feature)
+            if counters is None:
+                counters = self._features[call.feature] = _empty_counters()
+            counters["calls"] += 1
+            counters["outcomes"][call.outcome] += 1
+            counters["retries"] += call.retries
+            counters["hedges"] += call.hedges
+            counters["hedge_wins"] += call.hedge_won
+            if call.billed:
+                counters["prompt_tokens"] += call.billed_prompt_tokens
+                counters["output_tokens"] += call.output_tokens
+                counters["cost_usd"] += cost
+            elif call.outcome in ("cache", "coalesced"):
+                counters["saved_tokens"] += call.prompt_tokens + call.output_tokens
+                counters["saved_usd"] += cost
+            self._window.append((time.time(), call.feature, call.outcome, call.latency_ms, call.ttft_ms))
+        if self.metrics is not None:
+            self._export(call, cost)
+        if self.log_calls:
+            log.info(json.dumps(call.as_dict()))
+
+    def _export(self, call, cost):
+        labels = {"feature": call.feature, "outcome": call.outcome}
+        self.metrics.inc("llm_calls", **labels)
+        self.metrics.observe("llm_latency_ms", call.latency_ms, **labels)
+        if call.ttft_ms is not None:
+            self.metrics.observe("llm_ttft_ms", call.ttft_ms, **labels)
+        if call.retries:
+            self.metrics.inc("llm_retries", call.retries, feature=call.feature)
+        if call.hedges:
+            self.metrics.inc("llm_hedges", call.hedges, feature=call.feature, won=str(call.hedge_won).lower())
+        if call.billed:
+            self.metrics.inc("llm_tokens", call.billed_prompt_tokens, feature=call.feature, kind="prompt")
+            self.metrics.inc("llm_tokens", call.output_tokens, feature=call.feature, kind="output")
+            self.metrics.inc("llm_cost_usd", cost, feature=call.feature)
+        elif call.outcome in ("cache", "coalesced"):
+            self.metrics.inc("llm_saved_usd", cost, feature=call.feature)
+
+    def summary(self):
+        """Per-feature counters plus latency/TTFT percentiles (by outcome) over the rolling window."""
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            features = {name: dict(c, outcomes=dict(c["outcomes"])) for name, c in self._features.items()}
+            recent = [entry for entry in self._window if entry[0] >= cutoff]
+        latencies, ttfts = {}, {}
+        for _, feature, outcome, latency_ms, ttft_ms in recent:
+            latencies.setdefault((feature, outcome), []).append(latency_ms)
+            if ttft_ms is not None:
+                ttfts.setdefault((feature, outcome), []).append(ttft_ms)
+
+        total = _empty_counters()
+        for name, counters in features.items():
+            for key in ("calls", "retries", "hedges", "hedge_wins", "prompt_tokens", "output_tokens", "saved_tokens", "cost_usd", "saved_usd"):
+                total[key] += counters[key]
+            for outcome, n in counters["outcomes"].items():
+                total["outcomes"][outcome] += n
+            served = counters["outcomes"]["cache"] + counters["outcomes"]["coalesced"]
+            counters["avoided_ratio"] = round(served / counters["calls"], 3) if counters["calls"] else 0.0
+            counters["cost_usd"] = round(counters["cost_usd"], 6)
+            counters["saved_usd"] = round(counters["saved_usd"], 6)
+            counters["latency_ms"] = {o: percentiles(v) for (f, o), v in latencies.items() if f == name}
+            counters["ttft_ms"] = {o: percentiles(v) for (f, o), v in ttfts.items() if f == name}
+        total["cost_usd"] = round(total["cost_usd"], 6)
+        total["saved_usd"] = round(total["saved_usd"], 6)
+        by_cost = dict(sorted(features.items(), key=lambda item: -item[1]["cost_usd"]))
+        return {"window_seconds": self.window_seconds, "total": total, "features": by_cost}
+
+
+def _would_emit(logger, level):
+    """Whether a handler on logger or its ancestors would output a record at `level`."""
+    while logger is not None:
+        if any(handler.level <= level for handler in logger.handlers):
+            return True
+        if not logger.propagate:
+            return False
+        logger = logger.parent
+    return False
+
+
+def telemetry_from_env(metrics=None, env=None):
+    env = os.environ if env is None else env
+    log_calls = env.get("GLOBALWELL_LLM_LOG", "").lower() in ("1", "true", "yes")
+    if log_calls:
+        # The root logger's level (WARNING by default) would otherwise drop every call line.
+        log.setLevel(logging.INFO)
+        if not _would_emit(log, logging.INFO):
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log.addHandler(handler)
+    prices = dict(PRICES_PER_MILLION)
+    model_name = env.get("GLOBALWELL_MODEL", DEFAULT_MODEL_NAME)
+    if ("GLOBALWELL_PRICE_INPUT_PER_M" in env or "GLOBALWELL_PRICE_OUTPUT_PER_M" in env):
+        default_in, default_out = model_price(model_name)
+        prices[model_name] = (float(env.get("GLOBALWELL_PRICE_INPUT_PER_M", default_in)),
+                              float(env.get("GLOBALWELL_PRICE_OUTPUT_PER_M", default_out)))
+    return LLMTelemetry(metrics=metrics, log_calls=log_calls,
+                        window_seconds=float(env.get("GLOBALWELL_LLM_WINDOW_SECONDS", "900")), prices=prices)
@@ -0,0 +1,234 @@
+"""Precomputed seasonal local insights (produce guide + myth buster).
+
+The answer to `get_local_info_prompt` only really depends on where the user
+is and what month it is, so insights are stored in SQLite keyed by the
+normalized (region, country, month). The table is filled offline in bulk:
+
+    python local_insights.py locations.csv --months all --concurrency 8
+
+At runtime an exact entry is served straight from the index. If only another
+month (or an outdated entry) exists for the location, that text is served
+while the current month is regenerated in the background; live generation is
+only needed for locations the index has never seen.
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from prompts import get_local_info_prompt
+
+
+DEFAULT_INSIGHTS_PATH = os.path.join(".globalwell_data", "local_insights.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS insights (
+    region    TEXT NOT NULL,
+    country   TEXT NOT NULL,
+    month     INTEGER NOT NULL,
+    body      TEXT NOT NULL,
+    generated REAL NOT NULL,
+    PRIMARY KEY (region, country, month)
+) WITHOUT ROWID
+"""
+
+
+def normalize_place(name):
+    return re.sub(r'[^\w]+', ' ', (name or "").casefold()).strip()
+
+
+def insight_key(region, country, month):
+    return normalize_place(region), normalize_place(country), int(month)
+
+
+def current_month(today=None):
+    return (today or datetime.date.today()).month
+
+
+def insight_prompt(region, country, month):
+    return get_local_info_prompt(f"{region}, {country}", month=calendar.month_name[month])
+
+
+class InsightIndex:
+    def __init__(self, path=DEFAULT_INSIGHTS_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, region, country, month):
+        """(body, generated_at) for the exact key, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, generated FROM insights WHERE region = ? AND country = ? AND month = ?",
+                insight_key(region, country, month),
+            ).fetchone()
+        return row
+
+    def nearest(self, region, country, month):
+        """The entry for this location closest to `month`, preferring earlier months. None if unknown."""
+        region, country, month = insight_key(region, country, month)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT month, body, generated FROM insights WHERE region = ? AND country = ?",
+                (region, country),
+            ).fetchall()
+        if not rows:
+            return None
+        _, body, generated = min(rows, key=lambda r: ((month - r[0]) % 12, r[0]))
+        return body, generated
+
+    def put(self, region, country, month, body, generated=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO insights (region, country, month, body, generated) VALUES (?, ?, ?, ?, ?)",
+                insight_key(region, country, month) + (body, generated or time.time()),
+            )
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM insights").fetchone()[0]
+
+
+class LocalInsights:
+    """Index lookups with stale-while-revalidate refresh through `generate(prompt)`."""
+
+    def __init__(self, index, generate, executor, max_age_days=120):
+        self.index = index
+        self.generate = generate
+        self.executor = executor
+        self.max_age = max_age_days * 86400
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0}
+
+    def lookup(self, region, country, month=None):
+        """Return (body, fresh). body is None on a miss; a stale body triggers a background refresh."""
+        month = month or current_month()
+        entry = self.index.get(region, country, month)
+        if entry is not None and time.time() - entry[1] < self.max_age:
+            self.stats["hits"] += 1
+            return entry[0], True
+        if entry is None:
+            entry = self.index.nearest(region, country, month)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None, False
+        self.stats["stale"] += 1
+        self.refresh(region, country, month)
+        return entry[0], False
+
+    def fetch(self, region, country, month=None):
+        """Generate live for this key and store it (the miss path; blocking)."""
+        month = month or current_month()
+        body = self.generate(insight_prompt(region, country, month))
+        if body:
+            self.index.put(region, country, month, body)
+        return body
+
+    def refresh(self, region, country, month):
+        key = insight_key(region, country, month)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self.stats["refreshes"] += 1
+        future = self.executor.submit(self.fetch, region, country, month)
+        future.add_done_callback(lambda _: self._refreshing.discard(key))
+
+
+# --- Offline bulk build ---
+def read_locations(path):
+    """Unique (region, country) pairs from a CSV/JSONL with `region` and `country` columns."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    seen, locations = set(), []
+    for row in rows:
+        region, country = (row.get("region") or "").strip(), (row.get("country") or "").strip()
+        key = (normalize_place(region), normalize_place(country))
+        if region and country and key not in seen:
+            seen.add(key)
+            locations.append((region, country))
+    return locations
+
+
+def parse_months(spec, today=None):
+    month = current_month(today)
+    if spec == "all":
+        return list(range(1, 13))
+    if spec == "current":
+        return [month]
+    if spec == "next":
+        return [month % 12 + 1]
+    return [int(m) for m in spec.split(",")]
+
+
+def build_index(insights, locations, months, concurrency=8, force=False, progress=True):
+    todo = [(region, country, month) for region, country in locations for month in months
+            if force or insights.index.get(region, country, month) is None]
+    done, failed = 0, 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(insights.fetch, *key): key for key in todo}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"\n{futures[future]}: {type(e).__name__}: {e}", file=sys.stderr)
+            if progress:
+                print(f"\r{done + failed}/{len(todo)} insights, {failed} errors", end="", file=sys.stderr, flush=True)
+    if progress and todo:
+        print(file=sys.stderr)
+    return {"requested": len(locations) * len(months), "generated": done, "failed": failed,
+            "indexed": insights.index.count()}
+
+
+def main(argv=None):
+    from llm import client_from_env
+    from response_cache import DEFAULT_CACHE_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("locations", help="CSV or JSONL with region and country columns (a batch profile file works)")
+    parser.add_argument("--months", default="all", help="all, current, next, or a comma-separated list like 6,7,8")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--force", action="store_true", help="regenerate entries that already exist")
+    parser.add_argument("--index-path", default=os.getenv("GLOBALWELL_INSIGHTS_PATH", DEFAULT_INSIGHTS_PATH))
+    parser.add_argument("--cache-path", default=os.getenv("GLOBALWELL_CACHE_PATH", DEFAULT_CACHE_PATH))
+    args = parser.parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    client = client_from_env(args.cache_path)
+    insights = LocalInsights(InsightIndex(args.index_path), partial(client.generate, feature="local_info"),
+                             executor=None)
+    summary = build_index(insights, read_locations(args.locations), parse_months(args.months),
+                          concurrency=args.concurrency, force=args.force)
+    summary["llm"] = client.telemetry.summary()["total"]
+    print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
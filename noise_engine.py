@@ -0,0 +1,191 @@
+"""Procedural ambient noise: white, pink, brown and rain.
+
+Each texture is synthesized in the frequency domain over the whole loop: a
+random spectrum is shaped (1/f^alpha slopes, band emphasis) and transformed
+back with one inverse real FFT. The result is periodic by construction, so
+an `<audio loop>` repeats it without a click. Rain adds droplets placed on the
+same circular timeline, so they wrap around the loop boundary too.
+
+A loop is rendered once per (kind, seconds, sample rate, seed), encoded to
+16-bit mono WAV (or OGG Vorbis when `soundfile` is installed) and kept by
+the engine for every session. Memory is bounded by seconds * sample_rate * 2
+bytes per texture (plus the encoded copy): 480 KB for the default 15 s at
+16 kHz. `iter_wav_stream` instead serves the loop as an endless WAV stream of
+fixed-size PCM blocks paced at playback speed, for clients that shouldn't
+download a whole file.
+
+NumPy is imported on first render, so app startup doesn't pay for it.
+"""
+import io
+import struct
+import threading
+import time
+import wave
+
+
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_LOOP_SECONDS = 15
+TARGET_RMS = 0.1  # about -20 dBFS, leaves headroom for rain droplets
+
+KINDS = ("white", "pink", "brown", "rain")
+MIME_TYPES = {"wav": "audio/wav", "ogg": "audio/ogg"}
+
+
+def _shaped_noise(np, rng, n, sample_rate, alpha=0.0, low_hz=20.0, high_hz=None):
+    """Periodic noise of length n whose power falls off as 1/f^alpha between low_hz and high_hz."""
+    freqs = np.fft.rfftfreq(n, 1.0 / sample_rate)
+    spectrum = rng.standard_normal(freqs.size) + 1j * rng.standard_normal(freqs.size)
+    gain = np.zeros_like(freqs)
+    band = freqs >= low_hz
+    if high_hz is not None:
+        band &= freqs <= high_hz
+    gain[band] = freqs[band] ** (-alpha / 2.0)
+    return np.fft.irfft(spectrum * gain, n)
+
+
+def _rain(np, rng, n, sample_rate):
+    # Bed: pink-ish hiss with the broadband "sheet" of rain emphasised around 1-5 kHz.
+    bed = _shaped_noise(np, rng, n, sample_rate, alpha=0.6, low_hz=200.0, high_hz=7000.0)
+    bed /= np.sqrt(np.mean(bed ** 2))
+
+    # Droplets: sparse impulses convolved (circularly) with a short decaying noise burst.
+    drops = np.zeros(n)
+    count = int(n / sample_rate * 40)
+    positions = rng.integers(0, n, count)
+    np.add.at(drops, positions, rng.uniform(0.3, 1.0, count))
+    kernel_len = int(0.012 * sample_rate)
+    kernel = rng.standard_normal(kernel_len) * np.exp(-np.arange(kernel_len) / (0.002 * sample_rate))
+    droplets = np.fft.irfft(np.fft.rfft(drops) * np.fft.rfft(kernel, n), n)
+    droplets /= np.sqrt(np.mean(droplets ** 2)) or 1.0
+
+    # Slow swells in intensity; whole cycles per loop keep it seamless.
+    t = np.arange(n) / n
+    swell = 1.0 + 0.15 * np.sin(2 * np.pi * 2 * t + rng.uniform(0, 2 * np.pi))
+    return (bed + 0.35 * droplets) * swell
+
+
+def synthesize(kind, seconds=DEFAULT_LOOP_SECONDS, sample_rate=DEFAULT_SAMPLE_RATE, seed=0):
+    """Float samples in [-1, 1] for one seamless loop."""
+    import numpy as np
+
+    if kind not in KINDS:
+        raise ValueError(f"Unknown noise kind {kind!r}; expected one of {', '.join(KINDS)}")
+    rng = np.random.default_rng([seed, KINDS.index(kind)])
+    n = int(seconds * sample_rate)
+    if kind == "white":
+        samples = _shaped_noise(np, rng, n, sample_rate, alpha=0.0)
+    elif kind == "pink":
+        samples = _shaped_noise(np, rng, n, sample_rate, alpha=1.0)
+    elif kind == "brown":
+        samples = _shaped_noise(np, rng, n, sample_rate, alpha=2.0)
+    else:
+        samples = _rain(np, rng, n, sample_rate)
+    samples *= TARGET_RMS / np.sqrt(np.mean(samples ** 2))
+    peak = np.abs(samples).max()
+    if peak > 0.9:  # a loud droplet shouldn't clip
+        samples *= 0.9 / peak
+    return samples
+
+
+def to_pcm16(samples):
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+def encode_wav(pcm, sample_rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def wav_stream_header(sample_rate):
+    # Sizes of 0xFFFFFFFF mean "until the connection ends" to browsers.
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+def encode_ogg(samples, sample_rate):
+    import soundfile
+
+    buffer = io.BytesIO()
+    soundfile.write(buffer, samples, sample_rate, format="OGG", subtype="VORBIS")
+    return buffer.getvalue()
+
+
+def ogg_available():
+    try:
+        import soundfile
+    except (ImportError, OSError):  # OSError: the package is there but libsndfile isn't
+        return False
+    return "OGG" in soundfile.available_formats()
+
+
+class NoiseEngine:
+    """Renders and caches one encoded loop per texture for the whole process."""
+
+    def __init__(self, seconds=DEFAULT_LOOP_SECONDS, sample_rate=DEFAULT_SAMPLE_RATE, fmt="wav", seed=0):
+        if fmt == "ogg" and not ogg_available():
+            fmt = "wav"
+        self.seconds = seconds
+        self.sample_rate = sample_rate
+        self.format = fmt
+        self.seed = seed
+        self.mime = MIME_TYPES[fmt]
+        self._loops = {}
+        self._pcm = {}
+        self._lock = threading.Lock()
+
+    def render(self, kind):
+        """Encoded bytes of the loop for `kind`, synthesized on first use."""
+        with self._lock:
+            data = self._loops.get(kind)
+            if data is None:
+                samples = synthesize(kind, self.seconds, self.sample_rate, self.seed)
+                self._pcm[kind] = to_pcm16(samples)
+                if self.format == "ogg":
+                    data = encode_ogg(samples, self.sample_rate)
+                else:
+                    data = encode_wav(self._pcm[kind], self.sample_rate)
+                self._loops[kind] = data
+            return data
+
+    def pcm(self, kind):
+        self.render(kind)
+        return self._pcm[kind]
+
+    def iter_chunks(self, kind, chunk_seconds=0.5, total_seconds=None):
+        """Raw 16-bit PCM blocks cycling through the loop (forever when total_seconds is None)."""
+        pcm = self.pcm(kind)
+        block = int(chunk_seconds * self.sample_rate) * 2
+        remaining = None if total_seconds is None else int(total_seconds * self.sample_rate) * 2
+        offset = 0
+        while remaining is None or remaining > 0:
+            size = block if remaining is None else min(block, remaining)
+            chunk = pcm[offset:offset + size]
+            if len(chunk) < size:  # wrap around the loop boundary
+                chunk += pcm[:size - len(chunk)]
+            offset = (offset + size) % len(pcm)
+            if remaining is not None:
+                remaining -= size
+            yield chunk
+
+    def iter_wav_stream(self, kind, chunk_seconds=0.5, prebuffer_seconds=2.0):
+        """An endless WAV stream: a header with open-ended sizes, then PCM paced at playback speed."""
+        yield wav_stream_header(self.sample_rate)
+        started = time.monotonic()
+        sent = 0.0
+        for chunk in self.iter_chunks(kind, chunk_seconds):
+            ahead = sent - prebuffer_seconds - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+            yield chunk
+            sent += chunk_seconds
+
+    def stats(self):
+        with self._lock:
+            return {"format": self.format, "loops": sorted(self._loops),
+                    "bytes": sum(len(data) for data in self._loops.values()) + sum(map(len, self._pcm.values()))}
@@ -0,0 +1,158 @@
+"""Shared base plans for similar profiles.
+
+Profiles are canonicalized into buckets: country and state, an age band,
+diet, activity and the goal reduced to a few canonical categories. One base
+plan is generated per bucket through the shared LLM client, so its response
+cache and single-flight make it once-per-bucket across sessions and restarts.
+The base plan is then personalized in one of two ways:
+
+* template: the goal maps fully onto the bucket's categories and there are
+  no health conditions or reason to account for, so only placeholders such as
+  [CITY] are substituted. No model call is made.
+* follow-up: a short prompt with just the section headings and the personal
+  details asks for a few bullets to add to the affected sections, which are
+  merged into the base plan.
+"""
+import hashlib
+import json
+import re
+import threading
+
+from chat_cache import keywords, normalize_question
+from chat_context import estimate_tokens
+from plan_doc import parse_plan
+from prompts import get_base_plan_prompt, get_personalize_prompt, get_wellness_plan_prompt
+
+
+AGE_BANDS = ((12, "under 13"), (17, "13-17"), (29, "18-29"), (44, "30-44"), (59, "45-59"), (74, "60-74"))
+OLDEST_BAND = "75+"
+
+GOAL_CATEGORIES = {
+    "weight management": "lose weight loss fat slim slimmer belly overweight obesity bmi",
+    "muscle and strength": "muscle muscles strength strong stronger tone toned bulk gain",
+    "better sleep": "sleep insomnia rest tired fatigue",
+    "stress and mood": "stress anxiety anxious mood calm relax relaxed mental happier depression",
+    "more energy": "energy energetic active lethargic",
+    "fitness and stamina": "fit fitness stamina endurance cardio run running marathon flexible flexibility",
+    "healthy eating": "eat eating diet nutrition healthy healthier junk sugar cravings",
+    "heart and blood sugar": "heart cholesterol blood pressure diabetes sugar glucose",
+}
+# Words that carry no goal of their own ("I want to feel better").
+GOAL_FILLER = frozenset("better more less improve improving feel feeling become stay start keep overall general "
+                        "life lifestyle habit habits healthy health body reduce build lower manage increase boost "
+                        "some little bit".split())
+
+_CATEGORY_INDEX = {word: category for category, words in GOAL_CATEGORIES.items() for word in words.split()}
+_PLACEHOLDER_RE = re.compile(r'\[(CITY|AGE)\]')
+
+
+def age_band(age):
+    age = int(age)
+    for upper, band in AGE_BANDS:
+        if age <= upper:
+            return band
+    return OLDEST_BAND
+
+
+def canonical_goal(goal):
+    """(canonical goal text, whether every goal word was accounted for)."""
+    words = keywords(normalize_question(goal)) - GOAL_FILLER
+    categories = sorted({_CATEGORY_INDEX[w] for w in words if w in _CATEGORY_INDEX})
+    leftover = sorted(w for w in words if w not in _CATEGORY_INDEX)
+    if not categories:
+        return " ".join(leftover[:4]) or "general well-being", False
+    return " and ".join(categories[:2]), not leftover and len(categories) <= 2
+
+
+def bucket_profile(inputs):
+    goal, covered = canonical_goal(inputs['goal'])
+    bucket = {
+        "country": inputs['country'].strip().title(),
+        "state": inputs['state'].strip().title(),
+        "age_band": age_band(inputs['age']),
+        "diet": inputs['diet'],
+        "activity": inputs['activity'],
+        "goal": goal,
+    }
+    return bucket, covered
+
+
+def bucket_key(bucket):
+    return hashlib.sha256(json.dumps(bucket, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def fill_template(plan, inputs):
+    values = {"CITY": inputs['region'] or inputs['state'], "AGE": str(inputs['age'])}
+    return _PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], plan)
+
+
+def merge_additions(base_doc, additions):
+    """Append the follow-up's bullets to the matching base sections; unknown headings go at the end."""
+    if not additions or additions.strip().upper().startswith("NONE"):
+        return base_doc.text
+    extra = {}
+    for section in parse_plan(additions.strip()).sections:
+        if section.bullets:
+            extra.setdefault(section.heading.casefold(), []).extend(section.bullets)
+    parts = []
+    for section in base_doc.sections:
+        bullets = extra.pop(section.heading.casefold(), None) if section.heading else None
+        markdown = section.markdown.rstrip()
+        if bullets:
+            markdown += "\n" + "\n".join(f"- {b}" for b in bullets)
+        parts.append(markdown)
+    leftover = [b for bullets in extra.values() for b in bullets]
+    if leftover:
+        parts.append("## Personal Notes\n" + "\n".join(f"- {b}" for b in leftover))
+    return "\n".join(parts)
+
+
+class BucketedPlanner:
+    def __init__(self, generate):
+        self.generate = generate
+        self._lock = threading.Lock()
+        self._buckets = set()
+        self._stats = {"plans": 0, "templated": 0, "personalized": 0,
+                       "prompt_tokens": 0, "output_tokens": 0, "full_generation_tokens": 0}
+
+    def plan(self, inputs):
+        """Return (plan text, info) for one profile."""
+        bucket, covered = bucket_profile(inputs)
+        base_prompt = get_base_plan_prompt(bucket)
+        base = self.generate(base_prompt)
+        key = bucket_key(bucket)
+        with self._lock:
+            first_for_bucket = key not in self._buckets
+            self._buckets.add(key)
+        prompt_tokens = estimate_tokens(base_prompt) if first_for_bucket else 0
+        output_tokens = estimate_tokens(base) if first_for_bucket else 0
+
+        # What a dedicated generation for this profile would have cost: its own prompt plus a full plan.
+        full_tokens = estimate_tokens(get_wellness_plan_prompt(inputs)) + estimate_tokens(base)
+        base = fill_template(base, inputs)
+        if covered and not inputs['health'] and not inputs['reason']:
+            mode, plan = "template", base
+        else:
+            base_doc = parse_plan(base)
+            followup = get_personalize_prompt(base_doc.headings(), inputs)
+            additions = self.generate(followup)
+            prompt_tokens += estimate_tokens(followup)
+            output_tokens += estimate_tokens(additions)
+            mode, plan = "personalized", merge_additions(base_doc, additions)
+
+        with self._lock:
+            self._stats["plans"] += 1
+            self._stats["templated" if mode == "template" else "personalized"] += 1
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["output_tokens"] += output_tokens
+            self._stats["full_generation_tokens"] += full_tokens
+        return plan, {"bucket": key, "mode": mode, "goal": bucket["goal"]}
+
+    def stats(self):
+        """Counts plus estimated tokens spent (base plans counted once per bucket in this process)."""
+        with self._lock:
+            stats = dict(self._stats, buckets=len(self._buckets))
+        plans = stats["plans"] or 1
+        stats["tokens_per_plan"] = round((stats["prompt_tokens"] + stats["output_tokens"]) / plans)
+        stats["full_tokens_per_plan"] = round(stats["full_generation_tokens"] / plans)
+        return stats
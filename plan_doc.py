@@ -0,0 +1,105 @@
+"""Structured wellness plan, parsed once per response.
+
+A `PlanDoc` splits the model's markdown into `## ` sections with their
+heading, bullet items, plain text lines for the PDF and a content hash. The
+plan tab renders `section.markdown`, the PDF builder walks `pdf_lines`, and
+`relevant_text` picks the sections a chat question is about so the prompt
+carries only those.
+"""
+import hashlib
+import math
+import re
+
+from chat_cache import keywords, normalize_question
+
+
+_BULLET_RE = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s+(.*)')
+
+# Everyday words that point at a plan section whose heading doesn't contain them.
+TOPIC_WORDS = {
+    "nutrition": "eat eating food meal meals diet breakfast lunch dinner snack snacks protein fruit fruits "
+                 "vegetable vegetables water drink hydration sugar calories recipe cook",
+    "physical activity": "exercise exercises workout workouts walk walking run running fitness gym steps "
+                         "stretch stretching yoga cardio strength muscle",
+    "mental well being": "stress anxiety anxious mood mind mindfulness meditation meditate calm breathing "
+                         "journal gratitude focus",
+    "sleep": "bed bedtime nap naps rest tired insomnia night wake waking",
+}
+
+
+def _stem(word):
+    return word[:5]
+
+
+_TOPIC_INDEX = {_stem(word): topic for topic, words in TOPIC_WORDS.items() for word in words.split()}
+
+
+def _terms(text):
+    return {_stem(w) for w in keywords(normalize_question(text))}
+
+
+class Section:
+    __slots__ = ("heading", "markdown", "bullets", "pdf_lines", "hash", "_heading_terms", "_body_terms")
+
+    def __init__(self, heading, markdown):
+        self.heading = heading
+        self.markdown = markdown
+        lines = markdown.split('\n')
+        self.bullets = tuple(m.group(1).strip() for m in map(_BULLET_RE.match, lines) if m)
+        self.pdf_lines = tuple(line.replace('###', '').replace('**', '') for line in lines)
+        self.hash = hashlib.sha256(markdown.encode("utf-8")).hexdigest()[:16]
+        self._heading_terms = _terms(heading)
+        self._body_terms = _terms(markdown)
+
+
+class PlanDoc:
+    def __init__(self, text, sections):
+        self.text = text
+        self.sections = sections
+        self.hash = hashlib.sha256(text.encode("utf-8")).hexdigest()  # same as plan_pdf.plan_hash
+
+    def __len__(self):
+        return len(self.sections)
+
+    def headings(self):
+        return [s.heading for s in self.sections if s.heading]
+
+    def relevant_sections(self, question, max_sections=2):
+        """Sections ranked by overlap with the question (heading matches count most). [] if nothing matches."""
+        terms = _terms(question)
+        topics = {_TOPIC_INDEX[t] for t in terms if t in _TOPIC_INDEX}
+        terms.update(_stem(w) for topic in topics for w in topic.split())
+        if not terms:
+            return []
+        n = len(self.sections)
+        scored = []
+        for section in self.sections:
+            score = 0.0
+            for term in terms:
+                if term in section._heading_terms:
+                    score += 3.0
+                elif term in section._body_terms:
+                    df = sum(term in s._body_terms for s in self.sections)
+                    score += math.log(1 + n / df)
+            if score > 0:
+                scored.append((score, section))
+        if not scored:
+            return []
+        best = max(score for score, _ in scored)
+        ranked = sorted((item for item in scored if item[0] >= best / 2), key=lambda item: -item[0])
+        return [section for _, section in ranked[:max_sections]]
+
+    def relevant_text(self, question, max_sections=2):
+        """Markdown of the sections relevant to `question`, in plan order; the whole plan if none stand out."""
+        chosen = self.relevant_sections(question, max_sections)
+        if not chosen:
+            return self.text
+        return "\n".join(s.markdown for s in self.sections if s in chosen)
+
+
+def parse_plan(text):
+    sections = []
+    for chunk in re.split(r'\n(?=## )', text):
+        heading = chunk.split('\n', 1)[0][3:].strip() if chunk.startswith('## ') else ""
+        sections.append(Section(heading, chunk))
+    return PlanDoc(text, sections)
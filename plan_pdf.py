@@ -0,0 +1,90 @@
+"""Plan PDF export, built off the script thread and memoized by plan content hash."""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from plan_doc import PlanDoc, parse_plan
+
+
+def generate_plan_pdf(plan):
+    # ReportLab is imported on first use so reruns that never build a PDF don't pay for it.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.enums import TA_CENTER
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    styles = getSampleStyleSheet()
+    styles['h1'].alignment = TA_CENTER
+    story = [Paragraph("Your Personalized Wellness Plan", styles['h1']), Spacer(1, 24)]
+    doc_plan = plan if isinstance(plan, PlanDoc) else parse_plan(plan)
+    for section in doc_plan.sections:
+        for line in section.pdf_lines:
+            if line.startswith('## '):
+                story.append(Paragraph(line.replace('## ', ''), styles['h2']))
+            else:
+                story.append(Paragraph(line, styles['Normal']))
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+def plan_hash(plan):
+    if isinstance(plan, PlanDoc):
+        return plan.hash
+    return hashlib.sha256(plan.encode("utf-8")).hexdigest()
+
+
+def build_pdf_bytes(plan):
+    return generate_plan_pdf(plan).getvalue()
+
+
+def write_plan_pdf(path, plan_text):
+    # Top-level so it can run in a ProcessPoolExecutor worker.
+    with open(path, "wb") as f:
+        f.write(build_pdf_bytes(plan_text))
+    return path
+
+
+class PdfCache:
+    """One PDF build per distinct plan, run on `executor`.
+
+    Finished PDFs are kept most-recently-used first and evicted once there are
+    more than `max_items` of them or they take more than `max_bytes` in total.
+    """
+
+    def __init__(self, executor, max_items=64, max_bytes=32 * 1024 * 1024, builder=build_pdf_bytes):
+        self.executor = executor
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.builder = builder
+        self._futures = OrderedDict()  # plan hash -> Future[bytes]
+        self._lock = threading.Lock()
+
+    def submit(self, plan):
+        """`plan` is a PlanDoc (preferred, already parsed) or raw plan text."""
+        key = plan_hash(plan)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or future.cancelled() or (future.done() and future.exception()):
+                future = self.executor.submit(self.builder, plan)
+                self._futures[key] = future
+            self._futures.move_to_end(key)
+            self._evict()
+        return future
+
+    def get_ready(self, plan):
+        future = self.submit(plan)
+        return future.result() if future.done() and not future.exception() else None
+
+    def _evict(self):
+        sizes = {key: len(future.result()) for key, future in self._futures.items()
+                 if future.done() and not future.exception()}
+        total = sum(sizes.values())
+        for key in list(self._futures)[:-1]:  # oldest first, never the entry just requested
+            if len(self._futures) <= self.max_items and total <= self.max_bytes:
+                break
+            if self._futures[key].done():  # in-flight builds are left to finish
+                del self._futures[key]
+                total -= sizes.get(key, 0)
@@ -0,0 +1,99 @@
+"""Prompt builders shared by the app and the headless tools."""
+import re
+
+
+PROFILE_FIELDS = ('country', 'state', 'region', 'age', 'gender', 'diet', 'activity', 'health', 'goal', 'reason')
+
+
+def sanitize_input(text):
+    if not text:
+        return ""
+    return re.sub(r'[\\*_]', '', text).strip()
+
+
+def get_wellness_plan_prompt(inputs):
+    return f"""
+You are GlobalWell AI, an empathetic AI Wellness Buddy. Provide a personalized, actionable wellness plan that aligns with **UN SDG 3**.
+
+
+**Core Instructions:**
+1. Accessibility & Affordability: Practical, low-cost, seasonal foods; minimal-equipment fitness.
+2. Holistic: Cover nutrition, physical activity, mental well-being, and sleep.
+3. Restriction: No specific supplements/medicines/drugs.
+4. Add a section: **Alignment with SDG 3**.
+
+
+**User Profile:**
+- Location: {inputs['region']}, {inputs['state']}, {inputs['country']} | Age: {inputs['age']}, Gender: {inputs['gender']}
+- Diet: {inputs['diet']}, Activity: {inputs['activity']} | Health Conditions: {inputs['health'] or 'None'}
+- Goal: {inputs['goal']} | Reason: {inputs['reason'] or 'Not specified'}
+"""
+
+
+def get_local_info_prompt(location, month=None):
+    when = f"in {month}" if month else "now"
+    return f"""
+As GlobalWell AI, for a user in **{location}**:
+1. **Hyper-Local Produce Guide:** List 3–4 seasonal, affordable, nutritious fruits/vegetables readily available {when}.
+2. **Wellness Myth Buster:** One relevant "Myth vs. Fact" debunking an expensive trend with a simple alternative.
+Format clearly with markdown.
+"""
+
+
+def get_base_plan_prompt(bucket):
+    return f"""
+You are GlobalWell AI, an empathetic AI Wellness Buddy. Provide an actionable wellness plan that aligns with **UN SDG 3**
+for a typical person in the group below. It will be shared by many people in this group.
+
+
+**Core Instructions:**
+1. Accessibility & Affordability: Practical, low-cost, seasonal foods; minimal-equipment fitness.
+2. Holistic: Cover nutrition, physical activity, mental well-being, and sleep.
+3. Restriction: No specific supplements/medicines/drugs.
+4. Add a section: **Alignment with SDG 3**.
+5. Use `## ` headings for sections. Wherever you would name the person's city, write [CITY] instead.
+
+
+**Group Profile:**
+- Location: {bucket['state']}, {bucket['country']} | Age: {bucket['age_band']}
+- Diet: {bucket['diet']}, Activity: {bucket['activity']}
+- Goal: {bucket['goal']}
+"""
+
+
+def get_personalize_prompt(headings, inputs):
+    section_list = "\n".join(f"- {h}" for h in headings)
+    return f"""
+Personalize this wellness plan for one user. Do not rewrite the plan. Its sections are:
+{section_list}
+
+**User:** {inputs['region']}, {inputs['state']}, {inputs['country']} | Age: {inputs['age']}, Gender: {inputs['gender']}
+- Health Conditions: {inputs['health'] or 'None'}
+- Goal in their words: {inputs['goal']} | Reason: {inputs['reason'] or 'Not specified'}
+
+Reply only with the sections that need changes for this user, each as `## <exact section heading>` followed by
+1-3 short bullet points to add. No supplements/medicines/drugs. If nothing needs changing, reply NONE.
+"""
+
+
+CONTENT_KINDS = {
+    "tip": ("daily wellness tips",
+            '{"text": "<one practical, low-cost tip, at most 20 words>"}'),
+    "fact": ("mindfulness and well-being facts",
+             '{"text": "<one well-established fact, at most 25 words>"}'),
+    "quiz": ("multiple-choice wellness quiz questions",
+             '{"question": "<question>", "options": ["<4 short options>"], '
+             '"answer": "<the correct option, copied exactly>", "explanation": "<one sentence>"}'),
+}
+
+
+def get_content_batch_prompt(kind, count, country=None, topic=None, batch=1):
+    label, shape = CONTENT_KINDS[kind]
+    audience = f"people in **{country}** (local foods, climate and customs)" if country else "a global audience"
+    focus = f"Focus on {topic}. " if topic else ""
+    return f"""
+As GlobalWell AI, write {count} distinct {label} for {audience}, aligned with **UN SDG 3** (set {batch}).
+{focus}Keep them practical, affordable and safe. Never recommend specific supplements, medicines or drugs.
+Reply with exactly {count} lines of JSON and nothing else, one object per line, shaped like:
+{shape}
+"""
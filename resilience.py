@@ -0,0 +1,300 @@
+"""Process-wide protection around model calls.
+
+ResilientCaller combines, in call order:
+
+- CircuitBreaker: fails fast while the upstream is degraded
+- TokenBucket: keeps the whole process under the request quota
+- AdaptiveConcurrencyLimiter: AIMD cap on simultaneous calls, shrinking on
+  errors and slow responses
+- RetryPolicy: jittered exponential backoff on retryable errors, all within
+  a per-call deadline
+"""
+import os
+import random
+import threading
+import time
+
+from llm import LLMError
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+                   "InternalServerError", "GatewayTimeout", "RetryError"}
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+class DeadlineExceededError(LLMError):
+    def __init__(self, message):
+        super().__init__(message, retryable=False)
+
+
+def is_retryable(exc):
+    if isinstance(exc, LLMError):
+        return exc.retryable
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(exc).__name__ in RETRYABLE_NAMES
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1.0, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Additive-increase / multiplicative-decrease limit on concurrent calls."""
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32, latency_target=20.0, backoff=0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def acquire(self, timeout=None):
+        with self._cond:
+            ok = self._cond.wait_for(lambda: self._in_flight < int(self._limit), timeout=timeout)
+            if ok:
+                self._in_flight += 1
+            return ok
+
+    def release(self, latency, ok):
+        with self._cond:
+            self._in_flight -= 1
+            if ok and latency <= self.latency_target:
+                # +1 per full window of successful calls
+                self._limit = min(self.max_limit, self._limit + 1.0 / max(1.0, self._limit))
+            else:
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            waited = time.monotonic() - self._opened_at
+            if self.state == self.OPEN and waited >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True  # let exactly one probe through
+                return
+            retry_in = max(1, int(self.reset_timeout - waited))
+        raise CircuitOpenError(
+            "The AI service is having trouble right now, so GlobalWell AI is pausing requests. "
+            f"Please try again in about {retry_in} seconds.")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def abort_trial(self):
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        # "Full jitter": spreads retries from many sessions instead of synchronizing them.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class ResilientCaller:
+    def __init__(self, rate_limiter=None, concurrency=None, breaker=None, retry=None, deadline=60.0):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self.retry = retry or RetryPolicy(max_attempts=1)
+        self.deadline = deadline
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        if self.concurrency is not None:
+            stats["concurrency_limit"] = self.concurrency.limit
+        if self.breaker is not None:
+            stats["breaker_state"] = self.breaker.state
+        return stats
+
+    def _deadline_exceeded(self):
+        self._count("deadline_exceeded")
+        return DeadlineExceededError("The AI service took too long to respond. Please try again.")
+
+    def _remaining(self, deadline_at):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise self._deadline_exceeded()
+        return remaining
+
+    def _admit(self, deadline_at):
+        if self.breaker is not None:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+        try:
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(timeout=self._remaining(deadline_at)):
+                raise self._deadline_exceeded()
+            if self.concurrency is not None and not self.concurrency.acquire(timeout=self._remaining(deadline_at)):
+                raise self._deadline_exceeded()
+        except DeadlineExceededError:
+            if self.breaker is not None:
+                self.breaker.abort_trial()
+            raise
+
+    def _finish(self, started, error):
+        ok = error is None
+        if self.concurrency is not None:
+            self.concurrency.release(time.monotonic() - started, ok)
+        if self.breaker is not None:
+            if ok:
+                self.breaker.record_success()
+            elif is_retryable(error):
+                self.breaker.record_failure()
+            else:
+                self.breaker.abort_trial()  # client-side errors say nothing about upstream health
+        if not ok:
+            self._count("failures")
+
+    def _should_retry(self, error, attempt, deadline_at):
+        if not is_retryable(error) or attempt + 1 >= self.retry.max_attempts:
+            return False
+        delay = self.retry.backoff(attempt)
+        if time.monotonic() + delay >= deadline_at:
+            return False
+        self._count("retries")
+        time.sleep(delay)
+        return True
+
+    def call(self, fn, deadline=None):
+        """Run fn(timeout) with admission control and retries; fn gets the seconds left before the deadline."""
+        self._count("calls")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self._admit(deadline_at)
+            started = time.monotonic()
+            try:
+                result = fn(self._remaining(deadline_at))
+            except Exception as e:
+                self._finish(started, e)
+                if self._should_retry(e, attempt, deadline_at):
+                    attempt += 1
+                    continue
+                raise
+            self._finish(started, None)
+            return result
+
+    def stream(self, fn, deadline=None):
+        """Like call() for fn(timeout) returning an iterator; retries only happen before the first chunk."""
+        self._count("calls")
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            self._admit(deadline_at)
+            started = time.monotonic()
+            yielded = False
+            try:
+                for chunk in fn(self._remaining(deadline_at)):
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                self._finish(started, e)
+                if not yielded and self._should_retry(e, attempt, deadline_at):
+                    attempt += 1
+                    continue
+                raise
+            except GeneratorExit:
+                self._finish(started, None)  # consumer stopped early; not an upstream failure
+                raise
+            self._finish(started, None)
+            return
+
+
+def resilience_from_env(env=None):
+    env = os.environ if env is None else env
+    requests_per_minute = float(env.get("GLOBALWELL_RATE_LIMIT_RPM", "60"))
+    return ResilientCaller(
+        rate_limiter=TokenBucket(requests_per_minute / 60.0,
+                                 capacity=float(env.get("GLOBALWELL_RATE_LIMIT_BURST", "5"))),
+        concurrency=AdaptiveConcurrencyLimiter(
+            initial=int(env.get("GLOBALWELL_CONCURRENCY_INITIAL", "4")),
+            max_limit=int(env.get("GLOBALWELL_CONCURRENCY_MAX", "32")),
+            latency_target=float(env.get("GLOBALWELL_LATENCY_TARGET_SECONDS", "20")),
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=int(env.get("GLOBALWELL_BREAKER_FAILURES", "5")),
+            reset_timeout=float(env.get("GLOBALWELL_BREAKER_RESET_SECONDS", "30")),
+        ),
+        retry=RetryPolicy(max_attempts=int(env.get("GLOBALWELL_RETRY_ATTEMPTS", "3"))),
+        deadline=float(env.get("GLOBALWELL_LLM_DEADLINE_SECONDS", "60")),
+    )
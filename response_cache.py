@@ -0,0 +1,143 @@
+"""Two-tier (memory LRU + SQLite) cache for model responses.
+
+Keys are content hashes of (model name, normalized prompt, generation config),
+so identical prompts from any session share one stored response and the disk
+tier survives restarts.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_PATH = os.path.join(".globalwell_cache", "responses.sqlite3")
+
+
+def normalize_prompt(prompt):
+    # Whitespace-only differences (indentation, trailing newlines) shouldn't miss the cache.
+    return re.sub(r'\s+', ' ', prompt or '').strip()
+
+
+def make_cache_key(model_name, prompt, generation_config=None):
+    payload = json.dumps({
+        "model": model_name,
+        "prompt": normalize_prompt(prompt),
+        "config": generation_config or {},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_memory_items=256, max_disk_items=5000,
+                 ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (created, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0,
+                       "expired": 0, "evictions": 0, "writes": 0}
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expired"] += 1
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, created, value)
+                        self._stats["hits"] += 1
+                        self._stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expired"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        if value is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._stats["writes"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self, now):
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_disk_items
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                (overflow,),
+            )
+            self._stats["evictions"] += overflow
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            return stats
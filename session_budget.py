@@ -0,0 +1,246 @@
+"""Per-session memory accounting and large-object offloading.
+
+Large text in session state (the plan, local insights, old chat turns) is
+moved into a process-wide `BlobStore` keyed by content hash, and the session
+keeps only a small `BlobRef`. Identical plans served to many sessions from the
+response cache are therefore held once. Blobs live in a bounded in-memory LRU
+backed by SQLite, so eviction from memory never loses a session's data.
+
+`SessionBudget` measures every session-state key on each rerun and enforces
+a per-session budget. Large strings under the app-owned `offloadable` keys
+(never widget-bound ones) are offloaded first, then chat turns already
+folded into the rolling summary are spilled. Only after that are
+re-fetchable caches dropped. `SessionMemoryRegistry` keeps the latest
+measurement for every session for the node-wide report.
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_BLOB_PATH = os.path.join(".globalwell_cache", "session_blobs.sqlite3")
+
+# Process-wide objects that sessions merely point at; they are not session memory.
+_SHARED_PACKAGES = ("threading", "concurrent", "sqlite3", "_thread", "queue")
+
+
+class BlobRef:
+    __slots__ = ("hash", "size")
+
+    def __init__(self, hash, size):
+        self.hash = hash
+        self.size = size
+
+    def __repr__(self):
+        return f"BlobRef({self.hash[:12]}, {self.size})"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, path=DEFAULT_BLOB_PATH, max_memory_bytes=64 * 1024 * 1024, max_parsed=256,
+                 ttl_seconds=3 * 24 * 3600):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_parsed = max_parsed
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # hash -> text, least recently used first
+        self._memory_bytes = 0
+        self._parsed = OrderedDict()  # (hash, parser name) -> parsed object
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "dedup_hits": 0, "memory_hits": 0, "disk_hits": 0, "memory_evictions": 0}
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                             "accessed REAL NOT NULL)")
+            self._db.execute("DELETE FROM blobs WHERE accessed < ?", (time.time() - ttl_seconds,))
+            self._db.commit()
+
+    def put(self, text):
+        key = content_hash(text)
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._stats["puts"] += 1
+            if key in self._memory:
+                self._stats["dedup_hits"] += 1
+                self._memory.move_to_end(key)
+            else:
+                self._remember(key, text, size)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("INSERT INTO blobs (hash, data, accessed) VALUES (?, ?, ?) "
+                                     "ON CONFLICT(hash) DO UPDATE SET accessed = excluded.accessed",
+                                     (key, text, time.time()))
+        return BlobRef(key, size)
+
+    def get(self, ref):
+        with self._lock:
+            text = self._memory.get(ref.hash)
+            if text is not None:
+                self._stats["memory_hits"] += 1
+                self._memory.move_to_end(ref.hash)
+                return text
+            if self._db is None:
+                raise KeyError(ref.hash)
+            row = self._db.execute("SELECT data FROM blobs WHERE hash = ?", (ref.hash,)).fetchone()
+            if row is None:
+                raise KeyError(ref.hash)
+            self._stats["disk_hits"] += 1
+            self._remember(ref.hash, row[0], ref.size)
+            return row[0]
+
+    def _remember(self, key, text, size):
+        self._memory[key] = text
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1 and self._db is not None:
+            old_key, old_text = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_text.encode("utf-8"))
+            self._stats["memory_evictions"] += 1
+
+    def resolve(self, value):
+        return self.get(value) if isinstance(value, BlobRef) else value
+
+    def parsed(self, value, parser):
+        """parser(text), computed once per distinct text for the whole process."""
+        if value is None:
+            return None
+        key = (value.hash if isinstance(value, BlobRef) else content_hash(value), parser.__name__)
+        with self._lock:
+            result = self._parsed.get(key)
+            if result is not None:
+                self._parsed.move_to_end(key)
+                return result
+        result = parser(self.resolve(value))
+        with self._lock:
+            self._parsed[key] = result
+            while len(self._parsed) > self.max_parsed:
+                self._parsed.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, memory_items=len(self._memory), memory_bytes=self._memory_bytes,
+                        parsed_items=len(self._parsed))
+
+
+def deep_sizeof(obj, seen=None, depth=0):
+    """Approximate bytes held by obj, following containers and instance attributes."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or depth > 20:
+        return 0
+    seen.add(id(obj))
+    if type(obj).__module__.split(".")[0] in _SHARED_PACKAGES:
+        return 0
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None), BlobRef)):
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_sizeof(k, seen, depth + 1) + deep_sizeof(v, seen, depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_sizeof(item, seen, depth + 1) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen, depth + 1)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += deep_sizeof(getattr(obj, slot), seen, depth + 1)
+    return size
+
+
+class SessionMemoryRegistry:
+    """Latest per-key measurement for every live session on this node."""
+
+    def __init__(self, stale_after=3600):
+        self.stale_after = stale_after
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def record(self, session_id, sizes):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), sizes)
+
+    def report(self):
+        now = time.time()
+        with self._lock:
+            for session_id in [s for s, (seen, _) in self._sessions.items() if now - seen > self.stale_after]:
+                del self._sessions[session_id]
+            sessions = {s: {"total_bytes": sum(sizes.values()), "keys": sizes, "age_seconds": round(now - seen)}
+                        for s, (seen, sizes) in self._sessions.items()}
+        per_key = {}
+        for info in sessions.values():
+            for key, size in info["keys"].items():
+                per_key[key] = per_key.get(key, 0) + size
+        totals = [info["total_bytes"] for info in sessions.values()]
+        return {
+            "sessions": len(sessions),
+            "total_bytes": sum(totals),
+            "max_session_bytes": max(totals, default=0),
+            "mean_session_bytes": round(sum(totals) / len(totals)) if totals else 0,
+            "per_key_bytes": dict(sorted(per_key.items(), key=lambda item: -item[1])),
+            "per_session": sessions,
+        }
+
+
+class SessionBudget:
+    def __init__(self, state, blobs, budget_bytes=512 * 1024, offload_bytes=8 * 1024, offloadable=(), droppable=()):
+        self.state = state
+        self.blobs = blobs
+        self.budget_bytes = budget_bytes
+        self.offload_bytes = offload_bytes
+        # Only app-owned text keys, read back through text()/resolve(). Widget-bound keys (chat_input,
+        # g1_<date>, ...) must never be rewritten: Streamlit owns them once the widget is drawn.
+        self.offloadable = offloadable
+        self.droppable = droppable  # keys that can be rebuilt (e.g. from a shared index) if the budget demands
+
+    # --- reads/writes used by the app ---
+    def set_text(self, key, text):
+        if text is not None and len(text) > self.offload_bytes:
+            text = self.blobs.put(text)
+        self.state[key] = text
+
+    def text(self, key):
+        return self.blobs.resolve(self.state.get(key))
+
+    def resolve(self, value):
+        return self.blobs.resolve(value)
+
+    # --- accounting ---
+    def sizes(self):
+        return {str(key): deep_sizeof(value) for key, value in self.state.items()}
+
+    def enforce(self, chat_key="chat_history", summarized_upto=0):
+        """Bring the session under budget. Returns the per-key sizes after enforcement."""
+        sizes = self.sizes()
+        if sum(sizes.values()) <= self.budget_bytes:
+            return sizes
+        for key in self.offloadable:
+            value = self.state.get(key)
+            if isinstance(value, str) and sizes.get(key, 0) > self.offload_bytes:
+                self.state[key] = self.blobs.put(value)
+        self._spill_chat(chat_key, summarized_upto)
+        sizes = self.sizes()
+        for key in self.droppable:
+            if sum(sizes.values()) <= self.budget_bytes:
+                break
+            if self.state.get(key) is not None:
+                self.state[key] = None
+                sizes[key] = deep_sizeof(None)
+        return sizes
+
+    def _spill_chat(self, chat_key, summarized_upto):
+        # Turns folded into the summary are only displayed now; their text can live in the blob store.
+        # Message positions are kept so ChatMemory.summarized_upto stays valid.
+        for message in self.state.get(chat_key, [])[:summarized_upto]:
+            content = message.get("content")
+            if isinstance(content, str) and len(content) > 64:
+                message["content"] = self.blobs.put(content)
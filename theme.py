@@ -0,0 +1,156 @@
+"""Palette and stylesheet for the app.
+
+The CSS is formatted once at import time. Streamlit reruns re-execute app.py,
+but imported modules stay cached in sys.modules, so reruns only re-send the
+ready-made string.
+"""
+
+
+PALETTE_DARK = {
+    "BG": "#17224D",
+    "BG_GRADIENT": "linear-gradient(135deg, #17224D 0%, #233A75 100%)",
+    "TEXT": "#EAECEE",
+    "PRIMARY": "#F58125",
+    "PRIMARY_HOVER": "#F9A359",
+    "SECONDARY": "rgba(44, 81, 147, 0.5)",
+    "ACCENT": "#5184C4",
+    "ACCENT_HOVER": "#2C5193",
+    "DISCLAIMER_BG": "#2B3A67",
+    "DISCLAIMER_BORDER": "#F58125",
+    "TITLE_GRADIENT": "linear-gradient(45deg, #F58125, #FFFFFF)",
+    "CHAT_AI": "#2C5193",
+    "CHAT_USER": "#17224D",
+    "CARD_BG": "rgba(44, 81, 147, 0.4)",
+    "BORDER": "rgba(245, 129, 37, 0.4)",
+    "SECTION_BG": "rgba(44, 81, 147, 0.6)"
+}
+
+
+PALETTE = PALETTE_DARK  # Dark mode only
+
+
+# Spacing tweaks and dark-mode fixes.
+BASE_CSS = """
+    <style>
+    .block-container {padding-top: 0rem !important;}
+    h1 {margin-top: 0 !important;}
+    /* Sidebar text color in dark mode */
+    section[data-testid="stSidebar"] * {
+      color: #EAECEE !important;
+    }
+    /* Button container fix */
+    .sidebar-button-row {
+        display: flex;
+        justify-content: space-between;
+        gap: 8px;
+        margin-bottom: 10px;
+    }
+    .sidebar-button-row > div {
+        flex: 1 1 0px;
+    }
+    /* Fix text color for cards and section boxes in dark mode */
+    .section-box, .card {
+        color: #EAECEE !important;
+        background: rgba(44, 81, 147, 0.5) !important;
+    }
+    /* Additional global dark mode styling */
+    .stTextInput>div>div>input, .stTextArea>div>textarea {
+        color: #EAECEE !important;
+        background-color: #17224D !important;
+    }
+    </style>
+"""
+
+
+GLOBAL_CSS = f"""
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;700;800&display=swap');
+:root {{
+  --text: {PALETTE["TEXT"]};
+  --primary: {PALETTE["PRIMARY"]};
+  --primaryH: {PALETTE["PRIMARY_HOVER"]};
+  --accent: {PALETTE["ACCENT"]};
+  --border: {PALETTE["BORDER"]};
+  --card: {PALETTE["CARD_BG"]};
+}}
+.stApp {{
+  background: {PALETTE["BG_GRADIENT"]};
+  color: var(--text);
+  font-family: 'Inter', sans-serif;
+  transition: background-color 0.5s ease, color 0.5s ease;
+}}
+h1 {{
+  font-size: 3.0rem;
+  font-weight: 800;
+  text-align: center;
+  padding: 1rem 0 1.0rem 0;
+  background: {PALETTE["TITLE_GRADIENT"]};
+  -webkit-background-clip: text; -webkit-text-fill-color: transparent;
+  margin-top: 0 !important;
+  transition: color 0.5s ease;
+}}
+h3 {{ color: var(--text); font-weight: 700; margin-top: 1.2rem; }}
+
+.card, .section-box {{
+  background: var(--card);
+  backdrop-filter: blur(10px); -webkit-backdrop-filter: blur(10px);
+  border-radius: 18px;
+  padding: 1.3rem;
+  border: 1px solid var(--border);
+  box-shadow: 0 10px 30px 0 rgba(0,0,0,0.08);
+  transition: background-color 0.5s ease, color 0.5s ease, box-shadow .15s ease;
+}}
+.card:hover, .section-box:hover {{
+  transform: translateY(-2px);
+  box-shadow: 0 14px 35px rgba(0,0,0,0.12);
+}}
+section[data-testid="stSidebar"] {{
+  background: {PALETTE["SECONDARY"]};
+  backdrop-filter: blur(14px); -webkit-backdrop-filter: blur(14px);
+  border-right: 1px solid rgba(255,255,255,0.15);
+  transition: background-color 0.5s ease, color 0.5s ease;
+}}
+section[data-testid="stSidebar"] * {{ color: {PALETTE["TEXT"]} !important; }}
+
+div[data-testid="stButton"] > button {{
+  background: linear-gradient(45deg, var(--primary), var(--primaryH));
+  color: white; border-radius: 12px; padding: 12px 22px; font-weight: 700; border: none;
+  transition: transform .2s ease, box-shadow .2s ease;
+  box-shadow: 0 6px 20px rgba(0,0,0,0.2);
+}}
+div[data-testid="stButton"] > button:hover {{
+  transform: scale(1.03) translateY(-1px); box-shadow: 0 10px 28px rgba(0,0,0,0.25);
+}}
+
+div[data-testid="stTextInput"] input, div[data-testid="stTextArea"] textarea {{
+  border: 1px solid var(--border);
+  transition: all .2s ease-in-out !important;
+  color: var(--text) !important;
+  background-color: #17224D !important;
+}}
+div[data-testid="stTextInput"] input:focus, div[data-testid="stTextArea"] textarea:focus {{
+  border: 1px solid var(--primary);
+  box-shadow: 0 0 0 2px var(--border);
+}}
+
+div[data-testid="stTabs"] button[data-baseweb="tab"] {{
+  background-color: transparent; border-bottom: 2px solid transparent; color: var(--text);
+  transition: all .2s ease-in-out; padding: .8rem 1.2rem; border-radius: 10px 10px 0 0;
+}}
+div[data-testid="stTabs"] button[data-baseweb="tab"]:hover {{
+  background-color: {PALETTE["CARD_BG"]}; border-bottom: 2px solid {PALETTE["ACCENT"]};
+}}
+div[data-testid="stTabs"] button[aria-selected="true"] {{
+  border-bottom: 2px solid var(--primary); background-color: {PALETTE["CARD_BG"]};
+}}
+.disclaimer-box {{
+  background-color: {PALETTE["DISCLAIMER_BG"]};
+  border-left: 5px solid {PALETTE["DISCLAIMER_BORDER"]};
+  padding: 1rem 1.4rem; border-radius: 10px; margin-bottom: 1.3rem; color: var(--text); font-size: 14px;
+}}
+
+</style>
+"""
+
+
+APP_CSS = BASE_CSS + GLOBAL_CSS
@@ -0,0 +1,42 @@
+"""Pomodoro timer, breathing orb and chime as one static custom component.
+
+components/wellness_timer is plain HTML/JS/CSS: served as static files and
+cached by the browser, no build step. Its iframe stays mounted across reruns,
+so the timer, the AudioContext and the chime loop live in the browser and a
+rerun only sends the component's few arguments. Python starts or stops the
+timer by issuing a command with a fresh id; the component acts on each id
+once and reports back only when the phase changes:
+
+    {"command": id, "phase": "work" | "break" | "done" | "idle", "round": n, "remaining_ms": ms}
+"""
+import os
+from uuid import uuid4
+
+import streamlit.components.v1 as components
+
+from theme import PALETTE
+
+
+COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "wellness_timer")
+COLORS = {"primary": PALETTE["PRIMARY"], "accent": PALETTE["ACCENT"], "border": PALETTE["BORDER"],
+          "text": PALETTE["TEXT"]}
+
+_wellness_timer = components.declare_component("wellness_timer", path=COMPONENT_DIR)
+
+
+def start_command(work_min, break_min, rounds):
+    return {"id": uuid4().hex[:12], "action": "start", "work_ms": int(work_min * 60 * 1000),
+            "break_ms": int(break_min * 60 * 1000), "rounds": int(rounds)}
+
+
+def stop_command():
+    return {"id": uuid4().hex[:12], "action": "stop"}
+
+
+def pomodoro_timer(command, key="pomodoro_timer"):
+    """Render the orb and timer; returns the last phase report (None until the first one)."""
+    return _wellness_timer(view="pomodoro", command=command, colors=COLORS, key=key, default=None)
+
+
+def chime_player(playing, duration_sec, key="chime_player"):
+    _wellness_timer(view="chime", chime={"playing": playing, "duration_sec": duration_sec}, key=key, default=None)